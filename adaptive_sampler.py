@@ -0,0 +1,66 @@
+# adaptive_sampler.py
+import math
+import time
+import threading
+from collections import deque
+
+
+class AdaptiveSampler:
+    """根据处理延迟动态调整采样间隔，使实时源的滞后保持在 target_lag 秒附近。
+
+    空闲时按 target_fps 采样；有运动或正在跟踪车辆时（set_active(True)）
+    采样率翻倍。延迟超出目标时放宽间隔，明显低于目标时逐步收回。
+    interval() 可以直接作为 FrameSource.sampled_frames 的间隔函数。
+    """
+
+    def __init__(self, source_fps, target_fps=10, target_lag=0.5, max_interval=None,
+                 smoothing=0.2):
+        self.source_fps = source_fps or 25.0
+        self.base_interval = max(1, int(self.source_fps / target_fps))
+        self.active_interval = max(1, self.base_interval // 2)
+        self.max_interval = max_interval or max(self.base_interval, int(self.source_fps * 2))
+        self.target_lag = target_lag
+        self.smoothing = smoothing
+        self.lag = 0.0
+        self._active = False
+        self._interval = self.base_interval
+        self._decoded_at = {}
+        self._emitted = deque()
+        self._lock = threading.Lock()
+
+    def interval(self):
+        return self._interval
+
+    def set_active(self, active):
+        self._active = active
+
+    def frame_decoded(self, frame_index):
+        with self._lock:
+            self._decoded_at[frame_index] = time.monotonic()
+
+    def frame_done(self, frame_index):
+        """某帧处理完毕并输出时调用，更新滞后估计和采样间隔"""
+        now = time.monotonic()
+        with self._lock:
+            decoded_at = self._decoded_at.pop(frame_index, None)
+            # 被丢弃的帧不会走到这里，顺带清理比当前帧更早的时间戳
+            for stale in [i for i in self._decoded_at if i < frame_index]:
+                del self._decoded_at[stale]
+        if decoded_at is None:
+            return
+        self.lag += self.smoothing * ((now - decoded_at) - self.lag)
+        self._emitted.append(now)
+        while self._emitted and now - self._emitted[0] > 1.0:
+            self._emitted.popleft()
+        floor = self.active_interval if self._active else self.base_interval
+        interval = self._interval
+        if self.lag > self.target_lag * 1.2:
+            interval = math.ceil(interval * 1.5)
+        elif self.lag < self.target_lag * 0.5:
+            interval -= 1
+        self._interval = min(self.max_interval, max(floor, interval))
+
+    @property
+    def effective_fps(self):
+        """最近一秒实际输出的帧率"""
+        return float(len(self._emitted))
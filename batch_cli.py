@@ -0,0 +1,137 @@
+# batch_cli.py
+"""无界面批量识别：处理目录或通配符匹配到的图片和视频，结果按 JSONL 逐行输出。
+
+用法示例:
+    python batch_cli.py uploads/ "footage/2024-06-01/*.mp4" -o results.jsonl --workers 4
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+from ocr_backend import create_ocr_backend
+from ocr_cache import CachedOCRBackend
+from plate_detector import PlateDetector
+from plate_tracker import PlateTracker
+from plate_aggregator import PlateAggregator
+from frame_source import FrameSource
+from camera_config import load_camera_config
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv', '.flv')
+
+_detector = None
+_ocr = None
+_pyramid = None
+
+
+def collect_files(inputs, recursive=False):
+    """展开目录和通配符，返回去重且保持顺序的文件列表"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            matches = sorted(glob.glob(pattern, recursive=recursive))
+        else:
+            matches = sorted(glob.glob(item, recursive=recursive)) or [item]
+        for path in matches:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTS + VIDEO_EXTS) and path not in files:
+                files.append(path)
+    return files
+
+
+def _init_worker(ocr_name, pyramid=None):
+    """每个工作进程各自持有一个常驻 OCR 后端和图片检测器"""
+    global _detector, _ocr, _pyramid
+    _ocr = CachedOCRBackend(create_ocr_backend(ocr_name))
+    _pyramid = pyramid
+    _detector = PlateDetector(ocr=_ocr, pyramid=pyramid)
+
+
+def _process_image(path):
+    img = cv2.imread(path)
+    if img is None:
+        raise Exception(f"无法读取图像: {path}")
+    return _detector.detect([img])[0], 1
+
+
+def _process_video(path, target_fps):
+    source = FrameSource(path)
+    if not source.open():
+        raise Exception(f"无法打开视频: {path}")
+    try:
+        detector = PlateDetector(ocr=_ocr, camera=load_camera_config(path), pyramid=_pyramid)
+        tracker = PlateTracker()
+        aggregator = PlateAggregator(source.fps)
+        frames = 0
+        for frame_index, frame in source.sampled_frames(max(1, int(source.fps / target_fps))):
+            results = tracker.observe(detector.locate(frame), frame_index, detector)
+            aggregator.update(results, frame_index)
+            frames += 1
+        return aggregator.snapshot(), frames
+    finally:
+        source.release()
+
+
+def process_file(path, target_fps=10):
+    started = time.perf_counter()
+    record = {'file': path}
+    try:
+        if path.lower().endswith(VIDEO_EXTS):
+            record['kind'] = 'video'
+            plates, frames = _process_video(path, target_fps)
+        else:
+            record['kind'] = 'image'
+            plates, frames = _process_image(path)
+        record['plates'] = plates
+        record['frames'] = frames
+    except Exception as e:
+        record['error'] = str(e)
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量识别图片和视频中的车牌，结果以 JSONL 输出")
+    parser.add_argument('inputs', nargs='+', help="文件、目录或通配符")
+    parser.add_argument('-o', '--output', help="输出文件，默认输出到标准输出")
+    parser.add_argument('-w', '--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="并行进程数")
+    parser.add_argument('-r', '--recursive', action='store_true', help="递归处理子目录")
+    parser.add_argument('--fps', type=float, default=10, help="视频采样帧率")
+    parser.add_argument('--ocr', default='auto', choices=['auto', 'tesserocr', 'cli', 'none'], help="OCR 后端")
+    parser.add_argument('--pyramid', action='store_true', default=None,
+                        help="使用先粗后精的金字塔检测，默认按摄像头配置")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.inputs, recursive=args.recursive)
+    if not files:
+        logging.error("没有找到可处理的图片或视频")
+        return 1
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    started = time.perf_counter()
+    failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(args.ocr, args.pyramid)) as executor:
+            futures = [executor.submit(process_file, path, args.fps) for path in files]
+            for future in as_completed(futures):
+                record = future.result()
+                failed += 'error' in record
+                # 逐行写出并立即刷新，长时间批处理中途也能查看结果
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    logging.info(f"共处理 {len(files)} 个文件，失败 {failed} 个，用时 {time.perf_counter() - started:.1f} 秒")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,343 @@
+# benchmark.py
+"""检测、OCR 与计费的性能基准。
+
+用合成车牌（不同尺寸、角度、噪声）叠加到背景帧上，加上 uploads/ 中的样例图片，
+测量各阶段耗时、端到端帧率、单尺度与金字塔两种模式按车牌宽度的定位召回、
+计费吞吐量和本地 SQLite 入库吞吐量，
+结果保存为 JSON，并可与基线比较。
+
+用法示例:
+    python benchmark.py --save-baseline                 # 生成 benchmark_baseline.json
+    python benchmark.py --ocr none                      # 只测检测阶段
+    python benchmark.py --threshold 0.2                 # 与基线比较，变慢超过 20% 时返回 1
+"""
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import logging
+import platform
+import tempfile
+from datetime import datetime, timedelta
+import cv2
+import numpy as np
+from ocr_backend import create_ocr_backend, NullOCRBackend
+from plate_detector import PlateDetector, bbox_iou
+from fee_calculator import calculate_fee, load_billing_rules
+from stage_timing import stage_timers, DEFAULT_LANE
+from storage import SQLiteStorage
+
+BASELINE_PATH = 'benchmark_baseline.json'
+PLATE_LETTERS = 'ABCDEFGHJKLMNPQRSTUVWXYZ'
+PLATE_DIGITS = '0123456789'
+PLATE_WIDTHS = (140, 220, 320)
+PLATE_ANGLES = (0, 4, 8)
+NOISE_LEVELS = (0, 8, 20)
+# 候选框与真实车牌外接框的 IoU 达到该值即算定位成功
+LOCATE_IOU = 0.3
+
+
+def random_plate_text(rng):
+    """生成 7 位车牌号：两个字母加五位字母数字，至少包含一个数字"""
+    tail = [rng.choice(PLATE_LETTERS + PLATE_DIGITS) for _ in range(4)] + [rng.choice(PLATE_DIGITS)]
+    rng.shuffle(tail)
+    return rng.choice(PLATE_LETTERS) + rng.choice(PLATE_LETTERS) + ''.join(tail)
+
+
+def render_plate(text, plate_width, background=(160, 60, 0)):
+    """渲染蓝底白字的车牌图像，宽高比约 3.14"""
+    plate_height = int(plate_width / 3.14)
+    plate = np.empty((plate_height, plate_width, 3), dtype=np.uint8)
+    plate[:] = background
+    cv2.rectangle(plate, (2, 2), (plate_width - 3, plate_height - 3), (255, 255, 255), 2)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    (text_w, text_h), _ = cv2.getTextSize(text, font, 1.0, 2)
+    font_scale = min((plate_width * 0.85) / text_w, (plate_height * 0.6) / text_h)
+    thickness = max(1, int(font_scale * 2))
+    (text_w, text_h), _ = cv2.getTextSize(text, font, font_scale, thickness)
+    origin = ((plate_width - text_w) // 2, (plate_height + text_h) // 2)
+    cv2.putText(plate, text, origin, font, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
+    return plate
+
+
+def synthesize_frame(rng, np_rng, text, plate_width, angle, noise, frame_size=(1280, 720)):
+    """把车牌旋转后贴到带渐变和杂物的背景帧上，返回 (帧, 车牌真实外接框)"""
+    width, height = frame_size
+    gradient = np.linspace(60, 180, width, dtype=np.float32)
+    frame = np.repeat(np.repeat(gradient[None, :, None], height, axis=0), 3, axis=2).astype(np.uint8)
+    for _ in range(6):
+        x, y = rng.randrange(width - 200), rng.randrange(height - 150)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        cv2.rectangle(frame, (x, y), (x + rng.randrange(40, 200), y + rng.randrange(30, 150)), color, -1)
+    plate = render_plate(text, plate_width)
+    ph, pw = plate.shape[:2]
+    center = (pw / 2, ph / 2)
+    matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    out_w, out_h = int(ph * sin + pw * cos) + 2, int(ph * cos + pw * sin) + 2
+    matrix[0, 2] += out_w / 2 - center[0]
+    matrix[1, 2] += out_h / 2 - center[1]
+    rotated = cv2.warpAffine(plate, matrix, (out_w, out_h))
+    mask = cv2.warpAffine(np.full((ph, pw), 255, dtype=np.uint8), matrix, (out_w, out_h))
+    x = rng.randrange(width // 4, width - out_w - width // 4)
+    y = rng.randrange(height // 3, height - out_h - 10)
+    region = frame[y:y + out_h, x:x + out_w]
+    region[mask > 0] = rotated[mask > 0]
+    if noise:
+        frame = np.clip(frame.astype(np.int16) + np_rng.normal(0, noise, frame.shape).astype(np.int16),
+                        0, 255).astype(np.uint8)
+    return frame, (x, y, out_w, out_h)
+
+
+def build_scenes(seed):
+    """全部尺寸 × 角度 × 噪声组合的合成帧，加上 uploads/ 中的样例图片"""
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    scenes = []
+    for plate_width in PLATE_WIDTHS:
+        for angle in PLATE_ANGLES:
+            for noise in NOISE_LEVELS:
+                text = random_plate_text(rng)
+                frame, bbox = synthesize_frame(rng, np_rng, text, plate_width, angle, noise)
+                scenes.append({'name': f"synthetic_w{plate_width}_a{angle}_n{noise}",
+                               'frame': frame, 'text': text, 'bbox': bbox, 'plate_width': plate_width})
+    for path in sorted(glob.glob(os.path.join('uploads', '*'))):
+        frame = cv2.imread(path)
+        if frame is not None:
+            scenes.append({'name': os.path.basename(path), 'frame': frame, 'text': None, 'bbox': None,
+                           'plate_width': None})
+    return scenes
+
+
+def summarize(durations):
+    values = sorted(durations)
+    if not values:
+        return {'median_ms': 0.0, 'p95_ms': 0.0, 'runs': 0}
+    return {
+        'median_ms': round(values[len(values) // 2] * 1000, 3),
+        'p95_ms': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 3),
+        'runs': len(values)
+    }
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def bench_detection(scenes, ocr, repeat, pyramid=False):
+    """只调用检测器的公开接口；locate 内部的缩放、滤波等步骤由 stage_timers 分解"""
+    if repeat < 1:
+        raise ValueError(f"repeat 至少为 1: {repeat}")
+    detector = PlateDetector(ocr=ocr, pyramid=pyramid)
+    stages = {'locate': [], 'ocr_single': [], 'ocr_batch': [], 'detect': []}
+    hits = 0
+    synthetic = 0
+    for scene in scenes:
+        frame = scene['frame']
+        detector.detect([frame])  # 预热，分配工作缓冲区
+        for _ in range(repeat):
+            candidates, elapsed = _timed(detector.locate, frame)
+            stages['locate'].append(elapsed)
+            if candidates:
+                stages['ocr_single'].append(_timed(ocr.recognize, candidates[0]['crop'])[1])
+                stages['ocr_batch'].append(_timed(ocr.recognize_batch, [c['crop'] for c in candidates])[1])
+            results, elapsed = _timed(detector.detect_frame, frame)
+            stages['detect'].append(elapsed)
+        if scene['text'] is not None:
+            synthetic += 1
+            hits += any(result['plate'] == scene['text'] for result in results)
+    summary = {name: summarize(values) for name, values in stages.items()}
+    total = sum(stages['detect'])
+    return summary, {
+        'end_to_end_fps': round(len(stages['detect']) / total, 2) if total else 0.0,
+        'synthetic_recall': round(hits / synthetic, 3) if synthetic else None
+    }
+
+
+def bench_locate(scenes):
+    """单尺度和金字塔两种模式下 locate() 的定位召回，按车牌宽度统计 {模式: {wNNN: [定位数, 总数]}}"""
+    located = {}
+    for mode, pyramid in (('single', False), ('pyramid', True)):
+        detector = PlateDetector(ocr=NullOCRBackend(), pyramid=pyramid)
+        counts = {}
+        for scene in scenes:
+            if scene['bbox'] is None:
+                continue
+            hit = any(bbox_iou(c['bbox'], scene['bbox']) >= LOCATE_IOU for c in detector.locate(scene['frame']))
+            count = counts.setdefault(f"w{scene['plate_width']}", [0, 0])
+            count[0] += hit
+            count[1] += 1
+        located[mode] = dict(sorted(counts.items()))
+    return {'located': located}
+
+
+def bench_fee(iterations):
+    entry_time = datetime(2024, 1, 1, 8, 0)
+    rules = load_billing_rules()
+    samples = [(entry_time + timedelta(minutes=37 * i), color)
+               for i in range(100) for color in ('blue', 'green', 'yellow')]
+    started = time.perf_counter()
+    for i in range(iterations):
+        exit_time, color = samples[i % len(samples)]
+        calculate_fee(entry_time, exit_time + timedelta(minutes=1), color, rules)
+    elapsed = time.perf_counter() - started
+    # 不传 rules 时每次都读取 billing_rules.json，界面中目前就是这样调用的
+    file_iterations = max(1, iterations // 20)
+    started = time.perf_counter()
+    for i in range(file_iterations):
+        exit_time, color = samples[i % len(samples)]
+        calculate_fee(entry_time, exit_time + timedelta(minutes=1), color)
+    file_elapsed = time.perf_counter() - started
+    return {
+        'fee_ops_per_sec': round(iterations / elapsed, 1),
+        'fee_with_rule_load_ops_per_sec': round(file_iterations / file_elapsed, 1),
+        'rules': len(rules)
+    }
+
+
+def bench_storage(vehicles=400, batch_size=32, spaces=500):
+    """在临时 SQLite 库上测量批量入库吞吐量：先全部进场，再全部离场。
+
+    车辆数不超过车位数，正常情况下每条事件都是一次进场或离场；
+    仍被拒绝的事件（车型与车位类型不匹配）单独计数，不计入吞吐量。
+    """
+    rng = random.Random(0)
+    rules = load_billing_rules()
+    started_at = datetime(2024, 1, 1, 8, 0)
+    plates = sorted({random_plate_text(rng) for _ in range(min(vehicles, spaces))})
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'bench.db'),
+                                spaces={'small_car': spaces - spaces // 5, 'large_car': spaces // 5})
+        accepted = rejected = 0
+        started = time.perf_counter()
+        for offset in (timedelta(0), timedelta(hours=2)):
+            for i in range(0, len(plates), batch_size):
+                batch = [{'plate': plate, 'type': 'small_car' if j % 5 else 'large_car', 'plate_color': 'blue',
+                          'seen_at': started_at + offset, 'bbox': (0, 0, 0, 0)}
+                         for j, plate in enumerate(plates[i:i + batch_size])]
+                for outcome in storage.record_gate_events(batch, rules):
+                    if outcome['direction'] in ('entry', 'exit'):
+                        accepted += 1
+                    else:
+                        rejected += 1
+        elapsed = time.perf_counter() - started
+    return {
+        'storage_events_per_sec': round(accepted / elapsed, 1),
+        'storage_accepted': accepted,
+        'storage_rejected': rejected
+    }
+
+
+def compare(results, baseline, threshold):
+    """返回超过阈值的退化项：阶段耗时变长或吞吐量下降"""
+    regressions = []
+    for name, stage in results['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if base and base['median_ms'] > 0 and stage['runs']:
+            change = stage['median_ms'] / base['median_ms'] - 1
+            if change > threshold:
+                regressions.append(f"{name}: {base['median_ms']}ms -> {stage['median_ms']}ms (+{change:.0%})")
+    for key in ('end_to_end_fps', 'fee_ops_per_sec', 'storage_events_per_sec'):
+        base, current = baseline.get(key), results.get(key)
+        if base and current is not None:
+            change = 1 - current / base
+            if change > threshold:
+                regressions.append(f"{key}: {base} -> {current} (-{change:.0%})")
+    # 定位召回只要比基线少就算退化
+    for mode, widths in results.get('located', {}).items():
+        for width, (hits, total) in widths.items():
+            base = baseline.get('located', {}).get(mode, {}).get(width)
+            if base and base[1] == total and hits < base[0]:
+                regressions.append(f"located {mode} {width}: {base[0]}/{total} -> {hits}/{total}")
+    return regressions
+
+
+def run(seed=0, repeat=5, ocr_name='auto', fee_iterations=100000, pyramid=False):
+    scenes = build_scenes(seed)
+    ocr = create_ocr_backend(ocr_name)
+    # 引擎内置的阶段计时给出 locate 内部各步骤（resize、Canny、findContours 等）的分解
+    stage_timers.reset()
+    stage_timers.enable()
+    try:
+        stages, detection = bench_detection(scenes, ocr, repeat, pyramid)
+    finally:
+        stage_timers.disable()
+        ocr.close()
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+            'ocr': type(ocr).__name__,
+            'pyramid': pyramid,
+            'seed': seed,
+            'repeat': repeat,
+            'scenes': len(scenes)
+        },
+        'stages': stages,
+        'pipeline_stages': stage_timers.snapshot().get(DEFAULT_LANE, {})
+    }
+    results.update(detection)
+    results.update(bench_locate(scenes))
+    results.update(bench_fee(fee_iterations))
+    results.update(bench_storage())
+    return results
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"需要不小于 1 的整数: {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="车牌检测与计费性能基准")
+    parser.add_argument('--seed', type=int, default=0, help="合成场景的随机种子")
+    parser.add_argument('--repeat', type=_positive_int, default=5, help="每个场景重复次数")
+    parser.add_argument('--ocr', default='auto', choices=['auto', 'tesserocr', 'cli', 'none'], help="OCR 后端")
+    parser.add_argument('--pyramid', action='store_true', help="使用先粗后精的金字塔检测")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="本次结果输出文件")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="基线文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为新基线")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定退化的相对阈值")
+    args = parser.parse_args(argv)
+
+    results = run(seed=args.seed, repeat=args.repeat, ocr_name=args.ocr, pyramid=args.pyramid)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    for name, stage in results['stages'].items():
+        logging.info(f"{name:<12} median {stage['median_ms']:>9.3f} ms   p95 {stage['p95_ms']:>9.3f} ms")
+    logging.info(f"端到端 {results['end_to_end_fps']} fps，计费 {results['fee_ops_per_sec']} 次/秒，"
+                 f"SQLite 入库 {results['storage_events_per_sec']} 条/秒"
+                 f"（进出 {results['storage_accepted']} 条，拒绝 {results['storage_rejected']} 条）")
+    for mode, widths in results['located'].items():
+        logging.info(f"定位召回 {mode:<8} " + "  ".join(f"{width} {hits}/{total}"
+                                                      for width, (hits, total) in widths.items()))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        logging.info(f"已保存基线: {args.baseline}")
+        return 0
+    try:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        logging.info(f"没有基线文件 {args.baseline}，跳过比较")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        logging.warning(f"性能退化: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
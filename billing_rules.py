@@ -5,21 +5,13 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QComboBox, QDateTimeEdit, QTextEdit, QMessageBox, QSpinBox)
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, QDateTime
-import mysql.connector
-from datetime import datetime
 import json
-import math
 import logging
+from fee_calculator import BILLING_RULES_PATH, load_billing_rules, calculate_fee
+from storage import get_storage
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-db_config = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'zhang728',
-    'database': 'parking'
-}
-
 class BillingRulesPage(QWidget):
     def __init__(self):
         super().__init__()
@@ -63,14 +55,7 @@ class BillingRulesPage(QWidget):
         layout.addWidget(self.billing_table)
 
     def load_billing_rules(self):
-        try:
-            with open('billing_rules.json', 'r') as f:
-                rules = json.load(f)
-        except FileNotFoundError:
-            rules = [
-                {"plate_color": "blue", "time_range": "00:00-24:00", "first_hour": 5.0, "additional_hour": 2.0, "discount": 0.0},
-                {"plate_color": "green", "time_range": "00:00-24:00", "first_hour": 5.0, "additional_hour": 2.0, "discount": 10.0}
-            ]
+        rules = load_billing_rules()
         self.billing_table.setRowCount(0)
         for i, rule in enumerate(rules):
             self.billing_table.insertRow(i)
@@ -98,7 +83,7 @@ class BillingRulesPage(QWidget):
                 QMessageBox.critical(self, "错误", f"保存规则失败，第 {row + 1} 行数据无效: {e}")
                 return
         try:
-            with open('billing_rules.json', 'w') as f:
+            with open(BILLING_RULES_PATH, 'w') as f:
                 json.dump(rules, f, indent=4)
             QMessageBox.information(self, "成功", "计费规则保存成功")
         except Exception as e:
@@ -194,19 +179,7 @@ class BillingRulesPage(QWidget):
 
     def load_parking_plates(self):
         try:
-            conn = mysql.connector.connect(**db_config)
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(
-                """
-                SELECT lp.plate_number, lp.plate_color, pr.entry_time
-                FROM parking_records pr
-                JOIN license_plates lp ON pr.plate_id = lp.plate_id
-                WHERE pr.status = 'parking'
-                """
-            )
-            plates = cursor.fetchall()
-            cursor.close()
-            conn.close()
+            plates = get_storage().parked_vehicles()
             self.plate_combo.clear()
             if plates:
                 for plate in plates:
@@ -244,33 +217,7 @@ class BillingRulesPage(QWidget):
                 QMessageBox.critical(self, "错误", "离开时间必须晚于进入时间")
                 return
             total_amount = self.calculate_fee(entry_time, exit_time, plate_color)
-            conn = mysql.connector.connect(**db_config)
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(
-                """
-                SELECT record_id, space_id FROM parking_records
-                WHERE plate_id = (SELECT plate_id FROM license_plates WHERE plate_number = %s)
-                AND status = 'parking'
-                """,
-                (plate_number,)
-            )
-            record = cursor.fetchone()
-            if record:
-                cursor.execute(
-                    "UPDATE parking_records SET exit_time = %s, status = 'completed' WHERE record_id = %s",
-                    (exit_time, record['record_id'])
-                )
-                cursor.execute(
-                    "UPDATE parking_spaces SET status = 'free' WHERE space_id = %s",
-                    (record['space_id'],)
-                )
-                cursor.execute(
-                    "INSERT INTO parking_fees (record_id, total_amount, payment_status) VALUES (%s, %s, %s)",
-                    (record['record_id'], total_amount, 'unpaid')
-                )
-                conn.commit()
-            cursor.close()
-            conn.close()
+            get_storage().close_session(plate_number, exit_time, total_amount)
             self.vehicle_info_text.setText(
                 f"车牌: {plate_number} ({plate_color})\n"
                 f"进入时间: {entry_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
@@ -284,22 +231,4 @@ class BillingRulesPage(QWidget):
             QMessageBox.critical(self, "错误", f"计算费用失败: {e}")
 
     def calculate_fee(self, entry_time, exit_time, plate_color):
-        duration_minutes = (exit_time - entry_time).total_seconds() / 60
-        hours = max(1, math.ceil(duration_minutes / 60))
-        try:
-            with open('billing_rules.json', 'r') as f:
-                rules = json.load(f)
-        except FileNotFoundError:
-            rules = [
-                {"plate_color": "blue", "time_range": "00:00-24:00", "first_hour": 5.0, "additional_hour": 2.0, "discount": 0.0},
-                {"plate_color": "green", "time_range": "00:00-24:00", "first_hour": 5.0, "additional_hour": 2.0, "discount": 10.0}
-            ]
-        current_hour = exit_time.hour
-        for rule in rules:
-            if rule['plate_color'] == plate_color:
-                time_start, time_end = map(lambda x: int(x.split(':')[0]), rule['time_range'].split('-'))
-                if time_start <= current_hour <= time_end or (time_end < time_start and (current_hour >= time_start or current_hour <= time_end)):
-                    total = rule['first_hour'] + (hours - 1) * rule['additional_hour']
-                    total *= (1 - rule['discount'] / 100)
-                    return total
-        return 0.0
\ No newline at end of file
+        return calculate_fee(entry_time, exit_time, plate_color)
@@ -0,0 +1,47 @@
+# camera_config.py
+import os
+import json
+import logging
+
+CAMERA_CONFIG_PATH = 'camera_config.json'
+
+# roi: 检测区域多边形 [[x, y], ...]，整帧像素坐标，None 表示整帧
+# min_plate_size / max_plate_size: 车牌框的最小/最大 [宽, 高]，单位为缩放到工作宽度后的像素
+# gate_region: 运动检测区域 (x, y, w, h)，相对整帧宽高的比例，None 表示整帧
+# contour_mode: 'tree' 取全部轮廓，'external' 只取最外层轮廓
+# nms_iou: 候选框非极大值抑制的 IoU 阈值；top_k: 每帧最多送去 OCR 的候选数
+# pyramid: 是否使用先粗后精的金字塔检测，适合高分辨率、车牌远近差异大的机位
+DEFAULT_CAMERA_CONFIG = {
+    'roi': None,
+    'min_plate_size': [100, 20],
+    'max_plate_size': None,
+    'gate_region': None,
+    'contour_mode': 'tree',
+    'nms_iou': 0.3,
+    'top_k': 3,
+    'pyramid': False
+}
+
+
+def load_camera_config(source, path=CAMERA_CONFIG_PATH):
+    """读取某个视频源的检测配置。
+
+    配置文件格式为 {"default": {...}, "cameras": {"<源>": {...}}}，
+    源按完整路径/摄像头编号匹配，其次按文件名匹配，未配置的项使用默认值。
+    """
+    config = dict(DEFAULT_CAMERA_CONFIG)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return config
+    except Exception as e:
+        logging.error(f"读取摄像头配置错误: {e}")
+        return config
+    config.update(data.get('default', {}))
+    cameras = data.get('cameras', {})
+    key = str(source)
+    if key not in cameras:
+        key = os.path.basename(key)
+    config.update(cameras.get(key, {}))
+    return config
@@ -0,0 +1,135 @@
+# db_pool.py
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+try:
+    import mysql.connector
+    from mysql.connector import pooling, errors
+except ImportError:
+    # 使用 SQLite 存储的闸口机可以不安装 mysql-connector
+    mysql = None
+
+DB_CONFIG_PATH = 'db_config.json'
+
+# 连接参数的默认值，db_config.json 中同名项会覆盖；pool_size 为连接池大小
+# backend: 'mysql' 或 'sqlite'（不依赖数据库服务器的本地模式），见 storage.py
+# sqlite_path: SQLite 数据库文件；spaces: 新建 SQLite 库时按类型生成的车位数
+# auto_migrate: 启动时是否对 MySQL 执行 schema 迁移（SQLite 总是自动迁移）；为 False 且 schema 不是最新时拒绝启动
+DEFAULT_DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'zhang728',
+    'database': 'parking',
+    'pool_size': 5,
+    'backend': 'mysql',
+    'sqlite_path': 'parking.db',
+    'spaces': {'small_car': 40, 'large_car': 10},
+    'auto_migrate': False
+}
+# 不属于 MySQL 连接参数的配置项
+STORAGE_KEYS = ('backend', 'sqlite_path', 'spaces', 'auto_migrate')
+
+
+def load_db_config(path=DB_CONFIG_PATH):
+    config = dict(DEFAULT_DB_CONFIG)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.error(f"读取数据库配置错误: {e}")
+    return config
+
+
+db_config = load_db_config()
+
+
+class DatabasePool:
+    """线程安全的 MySQL 连接池。
+
+    取出的连接先 ping 检查，断开的连接自动重连；数据库暂时不可用导致建池失败时，
+    下次取连接会重新建池。连接用完后 close() 即归还到池中，推荐用 connection() 上下文。
+    """
+
+    def __init__(self, config=None, pool_name='parking'):
+        if mysql is None:
+            raise ImportError("MySQL 存储需要安装 mysql-connector-python")
+        config = dict(config if config is not None else db_config)
+        for key in STORAGE_KEYS:
+            config.pop(key, None)
+        self.pool_size = int(config.pop('pool_size', DEFAULT_DB_CONFIG['pool_size']))
+        self.config = config
+        self.pool_name = pool_name
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = pooling.MySQLConnectionPool(pool_name=self.pool_name, pool_size=self.pool_size,
+                                                         pool_reset_session=True, **self.config)
+                logging.info(f"数据库连接池已建立: {self.config.get('host')}/{self.config.get('database')}, "
+                             f"大小 {self.pool_size}")
+            return self._pool
+
+    def get_connection(self, timeout=5.0):
+        """取出一个可用连接，池已用尽时等待，最多 timeout 秒"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                conn = self._get_pool().get_connection()
+            except errors.PoolError:
+                # 池中连接都在使用
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+                continue
+            except mysql.connector.Error:
+                # 建池时数据库不可用，丢弃池以便下次重建
+                with self._lock:
+                    self._pool = None
+                raise
+            try:
+                conn.ping(reconnect=True, attempts=2, delay=0)
+            except mysql.connector.Error as e:
+                logging.warning(f"数据库连接失效，重连失败: {e}")
+                conn.close()
+                if time.monotonic() >= deadline:
+                    raise
+                continue
+            return conn
+
+    @contextmanager
+    def connection(self, timeout=5.0):
+        """with pool.connection() as conn: ...；出错时回滚未提交的事务，结束后归还连接"""
+        conn = self.get_connection(timeout)
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+            raise
+        finally:
+            conn.close()
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_db_pool():
+    """进程内共享的连接池，首次使用时按 db_config 创建"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = DatabasePool()
+        return _shared_pool
+
+
+def db_connection(timeout=5.0):
+    return get_db_pool().connection(timeout)
@@ -0,0 +1,63 @@
+# display_throttle.py
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+class DisplayThrottle(QObject):
+    """识别结果的呈现节流：按固定显示帧率把待显示帧合并为最新一帧，
+    并把一个刷新周期内的所有检测结果合并成一批交给界面处理。
+
+    submit() 必须在界面线程中调用（通过 Qt 信号的队列连接即可保证）。
+    被新帧替换掉的旧槽位通过 release_slot 归还给 FrameRing。
+    """
+    frame_ready = pyqtSignal(int)
+    results_ready = pyqtSignal(list)
+
+    def __init__(self, display_fps=25, parent=None):
+        super().__init__(parent)
+        self.release_slot = None
+        self.coalesced = 0
+        self._pending_slot = -1
+        self._pending_results = []
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+        self.set_display_fps(display_fps)
+
+    def set_display_fps(self, display_fps):
+        self._timer.setInterval(max(1, int(1000 / display_fps)))
+
+    def submit(self, slot, results):
+        if slot >= 0:
+            if self._pending_slot >= 0:
+                self._release(self._pending_slot)
+                self.coalesced += 1
+            self._pending_slot = slot
+        if results:
+            self._pending_results.extend(results)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """立即交出待处理的结果，丢弃待显示帧（用于停止识别前）"""
+        if self._pending_slot >= 0:
+            self._release(self._pending_slot)
+            self._pending_slot = -1
+        if self._pending_results:
+            results, self._pending_results = self._pending_results, []
+            self.results_ready.emit(results)
+        self._timer.stop()
+
+    def _release(self, slot):
+        if self.release_slot:
+            self.release_slot(slot)
+
+    def _tick(self):
+        if self._pending_slot < 0 and not self._pending_results:
+            # 没有新内容时停掉定时器，空闲时不占用事件循环
+            self._timer.stop()
+            return
+        if self._pending_slot >= 0:
+            slot, self._pending_slot = self._pending_slot, -1
+            self.frame_ready.emit(slot)
+        if self._pending_results:
+            results, self._pending_results = self._pending_results, []
+            self.results_ready.emit(results)
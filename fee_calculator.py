@@ -0,0 +1,43 @@
+# fee_calculator.py
+import math
+import json
+
+BILLING_RULES_PATH = 'billing_rules.json'
+
+DEFAULT_BILLING_RULES = [
+    {"plate_color": "blue", "time_range": "00:00-24:00", "first_hour": 5.0, "additional_hour": 2.0, "discount": 0.0},
+    {"plate_color": "green", "time_range": "00:00-24:00", "first_hour": 5.0, "additional_hour": 2.0, "discount": 10.0},
+    {"plate_color": "yellow", "time_range": "00:00-24:00", "first_hour": 10.0, "additional_hour": 4.0, "discount": 0.0}
+]
+# 规则中没有对应颜色（如旧的 billing_rules.json 没有黄牌规则）时按蓝牌规则计费，不会免费放行
+FALLBACK_PLATE_COLOR = 'blue'
+
+
+def load_billing_rules(path=BILLING_RULES_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return [dict(rule) for rule in DEFAULT_BILLING_RULES]
+
+
+def calculate_fee(entry_time, exit_time, plate_color, rules=None):
+    """根据计费规则计算费用，规则按顺序匹配，第一个匹配的规则生效。
+
+    rules 为 None 时从 billing_rules.json 读取；没有该颜色的规则时改用 FALLBACK_PLATE_COLOR 的规则。
+    """
+    if rules is None:
+        rules = load_billing_rules()
+    duration_minutes = (exit_time - entry_time).total_seconds() / 60
+    hours = max(1, math.ceil(duration_minutes / 60))
+    current_hour = exit_time.hour
+    for rule in rules:
+        if rule['plate_color'] == plate_color:
+            time_start, time_end = map(lambda x: int(x.split(':')[0]), rule['time_range'].split('-'))
+            if time_start <= current_hour <= time_end or (time_end < time_start and (current_hour >= time_start or current_hour <= time_end)):
+                total = rule['first_hour'] + (hours - 1) * rule['additional_hour']
+                total *= (1 - rule['discount'] / 100)
+                return total
+    if plate_color != FALLBACK_PLATE_COLOR and not any(rule['plate_color'] == plate_color for rule in rules):
+        return calculate_fee(entry_time, exit_time, FALLBACK_PLATE_COLOR, rules)
+    return 0.0
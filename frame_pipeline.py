@@ -0,0 +1,170 @@
+# frame_pipeline.py
+import threading
+import logging
+from collections import deque
+
+END = object()
+
+
+class FrameQueue:
+    """有界队列：队满时阻塞生产者形成背压，或在 drop_oldest 模式下丢弃最旧的一项"""
+
+    def __init__(self, maxsize, drop_oldest=False):
+        self.maxsize = max(1, maxsize)
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """放入一项，队列已关闭时返回 False"""
+        with self._cond:
+            while not self._closed and len(self._items) >= self.maxsize:
+                if self.drop_oldest:
+                    self._items.popleft()
+                    self.dropped += 1
+                    break
+                self._cond.wait()
+            if self._closed:
+                return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self):
+        """取出一项，队列关闭且已取空时返回 END"""
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            if not self._items:
+                return END
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def get_nowait(self):
+        """非阻塞取出一项，队列为空时返回 None，关闭且已取空时返回 END"""
+        with self._cond:
+            if not self._items:
+                return END if self._closed else None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def exhausted(self):
+        """已关闭且已取空"""
+        with self._cond:
+            return self._closed and not self._items
+
+    def close(self, discard=False):
+        with self._cond:
+            self._closed = True
+            if discard:
+                self._items.clear()
+            self._cond.notify_all()
+
+
+class FramePipeline:
+    """解码 → 检测 → 输出 三级流水线。
+
+    解码线程消费 frames 迭代器（产出 (帧序号, 帧)），检测线程池各自调用
+    worker_factory 创建的处理函数 worker(frame) 并行处理，results() 在调用线程中
+    按解码顺序产出 (帧序号, 帧, 处理结果)。各级之间为有界队列；drop_oldest 用于实时源，
+    检测跟不上时丢弃最旧的待检测帧而不是拖慢解码。
+    gate 为可选的 MotionGate，在解码线程中按顺序判断，未触发的帧不做检测，
+    以空结果直接输出。
+    """
+
+    def __init__(self, frames, worker_factory, workers=2, queue_size=8, drop_oldest=False,
+                 gate=None):
+        self._frames = frames
+        self._worker_factory = worker_factory
+        self.gate = gate
+        self.workers = max(1, workers)
+        self._input = FrameQueue(queue_size, drop_oldest=drop_oldest)
+        self._output = FrameQueue(queue_size)
+        self._seq_lock = threading.Lock()
+        self._next_seq = 0
+        self._active_workers = self.workers
+        self._threads = []
+        self._error = None
+
+    @property
+    def dropped(self):
+        return self._input.dropped
+
+    def start(self):
+        self._threads.append(threading.Thread(target=self._decode_loop, name="frame-decoder", daemon=True))
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._detect_loop, name=f"frame-detector-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._input.close(discard=True)
+        self._output.close(discard=True)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def results(self):
+        pending = {}
+        next_seq = 0
+        while True:
+            item = self._output.get()
+            if item is END:
+                break
+            pending[item[0]] = item
+            while next_seq in pending:
+                _, frame_index, frame, results = pending.pop(next_seq)
+                next_seq += 1
+                yield frame_index, frame, results
+        if self._error is not None:
+            raise self._error
+
+    def _fail(self, error):
+        logging.error(f"流水线错误: {error}")
+        if self._error is None:
+            self._error = error
+        self.stop()
+
+    def _decode_loop(self):
+        try:
+            for frame_index, frame in self._frames:
+                active = self.gate is None or self.gate.should_detect(frame)
+                if not self._input.put((frame_index, frame, active)):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._input.close()
+
+    def _detect_loop(self):
+        try:
+            worker = self._worker_factory()
+            while True:
+                # 取帧和分配序号放在同一把锁内，保证序号与解码顺序一致
+                with self._seq_lock:
+                    item = self._input.get()
+                    if item is END:
+                        break
+                    seq = self._next_seq
+                    self._next_seq += 1
+                frame_index, frame, active = item
+                results = worker(frame) if active else []
+                if not self._output.put((seq, frame_index, frame, results)):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            with self._seq_lock:
+                self._active_workers -= 1
+                last = self._active_workers == 0
+            if last:
+                self._output.close()
@@ -0,0 +1,53 @@
+# frame_ring.py
+import threading
+from collections import deque
+import cv2
+import numpy as np
+from plate_detector import draw_boxes
+
+
+class FrameRing:
+    """识别线程与界面线程共享的预分配显示帧环形缓冲区。
+
+    识别线程用 write() 把帧缩放到显示尺寸、画框并转换为 RGB，写入一个空闲槽位，
+    只把槽位序号发给界面；界面用 view() 取出后构建 QImage，显示完毕立即 release()。
+    没有空闲槽位时（界面来不及显示）直接跳过这一帧的显示，不阻塞识别。
+    """
+
+    def __init__(self, slots=4, display_size=(800, 500)):
+        self.slots = slots
+        self._display_size = display_size
+        self._buffers = [None] * slots
+        self._free = deque(range(slots))
+        self._lock = threading.Lock()
+
+    def set_display_size(self, width, height):
+        with self._lock:
+            self._display_size = (max(1, width), max(1, height))
+
+    def write(self, frame, results):
+        """写入一帧，返回槽位序号；没有空闲槽位时返回 -1"""
+        with self._lock:
+            if not self._free:
+                return -1
+            slot = self._free.popleft()
+            box_w, box_h = self._display_size
+        height, width = frame.shape[:2]
+        scale = min(box_w / width, box_h / height)
+        size = (max(1, int(height * scale)), max(1, int(width * scale)), 3)
+        buffer = self._buffers[slot]
+        if buffer is None or buffer.shape != size:
+            buffer = self._buffers[slot] = np.empty(size, dtype=np.uint8)
+        cv2.resize(frame, (size[1], size[0]), dst=buffer, interpolation=cv2.INTER_AREA)
+        draw_boxes(buffer, results, scale=scale)
+        cv2.cvtColor(buffer, cv2.COLOR_BGR2RGB, dst=buffer)
+        return slot
+
+    def view(self, slot):
+        return self._buffers[slot]
+
+    def release(self, slot):
+        if slot < 0:
+            return
+        with self._lock:
+            self._free.append(slot)
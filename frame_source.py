@@ -0,0 +1,95 @@
+# frame_source.py
+import os
+import time
+import cv2
+
+# 间隔达到该帧数时，文件源直接按帧号跳转，而不是逐帧 grab
+SEEK_MIN_INTERVAL = 30
+LOOP_PREFIX = 'loop:'
+
+
+class FrameSource:
+    """视频帧来源：视频文件、摄像头编号或 RTSP 等流地址。
+
+    sampled_frames() 只解码需要处理的帧：跳过的帧用 grab() 前进，
+    只对采样帧调用 retrieve()；文件源在采样间隔较大时直接按帧号跳转。
+    loop=True 时文件播完后从头循环，realtime=True 时按源帧率限速，
+    两者结合可以用本地文件模拟 RTSP 实时流。
+    """
+
+    def __init__(self, source, loop=False, realtime=False):
+        self.source = source
+        self.loop = loop
+        self.realtime = realtime
+        self.cap = None
+        self.fps = 0.0
+        self.frame_count = 0
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """解析源描述：纯数字为摄像头编号，"loop:路径" 为循环播放的本地文件，其余原样传给 OpenCV"""
+        if isinstance(spec, int):
+            return cls(spec)
+        if spec.isdigit():
+            return cls(int(spec))
+        if spec.startswith(LOOP_PREFIX):
+            return cls(spec[len(LOOP_PREFIX):], loop=True, realtime=True)
+        return cls(spec)
+
+    @property
+    def is_live(self):
+        return not self.is_file or self.realtime
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            return False
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.is_file else 0
+        return True
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+    def _rewind(self):
+        if not (self.loop and self.is_file):
+            return False
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return True
+
+    def sampled_frames(self, frame_interval, should_continue=lambda: True):
+        """按间隔产出 (帧序号, 帧)；frame_interval 可以是整数或返回整数的函数。
+
+        循环播放时帧序号持续递增，不随文件回到开头而重置。
+        """
+        interval_of = frame_interval if callable(frame_interval) else (lambda: frame_interval)
+        frame_index = 0
+        position = 0
+        started = time.monotonic()
+        while should_continue() and self.cap.isOpened():
+            if self.frame_count and position >= self.frame_count:
+                if not self._rewind():
+                    break
+                position = 0
+            ok, frame = self.cap.retrieve() if self.cap.grab() else (False, None)
+            if not ok:
+                if position > 0 and self._rewind():
+                    position = 0
+                    continue
+                break
+            if self.realtime:
+                delay = started + frame_index / self.fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield frame_index, frame
+            interval = max(1, interval_of())
+            frame_index += interval
+            position += interval
+            if self.is_file and interval >= SEEK_MIN_INTERVAL:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            else:
+                for _ in range(interval - 1):
+                    if not self.cap.grab():
+                        break
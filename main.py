@@ -3,6 +3,7 @@ import os
 import cv2
 from PyQt5.QtWidgets import QApplication
 from ui_main import LicensePlateRecognizer
+from stage_timing import stage_timers
 import traceback
 def exception_hook(exctype, value, tb):
     print("全局异常捕获:")
@@ -14,6 +15,12 @@ if __name__ == "__main__":
 
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+    # 设置 PLATE_METRICS_PORT 时开启阶段计时，并在本地提供 Prometheus 文本格式的指标
+    metrics_port = os.environ.get('PLATE_METRICS_PORT')
+    if metrics_port:
+        stage_timers.enable()
+        stage_timers.serve(int(metrics_port))
+
     app = QApplication(sys.argv)
     window = LicensePlateRecognizer()
     window.show()
@@ -0,0 +1,81 @@
+# motion_gate.py
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """在缩小后的灰度帧上做背景差分，只有闸口区域有变化时才需要完整检测。
+
+    gate_region 为 (x, y, w, h)，取值是相对整帧宽高的比例（0~1），
+    None 表示整帧。检测到变化后会继续放行 hold_frames 帧，
+    避免车辆停稳后立刻停止识别。
+    """
+
+    def __init__(self, gate_region=None, scale_width=160, diff_threshold=25,
+                 min_changed_ratio=0.01, learning_rate=0.05, hold_frames=5):
+        self.gate_region = gate_region
+        self.scale_width = scale_width
+        self.diff_threshold = diff_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.learning_rate = learning_rate
+        self.hold_frames = hold_frames
+        self.checked = 0
+        self.skipped = 0
+        self.active = False
+        self._hold = 0
+        self._shape = None
+        self._small = None
+        self._gray = None
+        self._background = None
+        self._background_u8 = None
+        self._diff = None
+        self._region = None
+
+    def _ensure_buffers(self, frame):
+        height, width = frame.shape[:2]
+        if self._shape == (height, width):
+            return
+        self._shape = (height, width)
+        small_w = min(self.scale_width, width)
+        small_h = max(1, int(height * small_w / width))
+        self._small = np.empty((small_h, small_w, 3), dtype=np.uint8)
+        self._gray = np.empty((small_h, small_w), dtype=np.uint8)
+        self._background = None
+        self._background_u8 = np.empty((small_h, small_w), dtype=np.uint8)
+        self._diff = np.empty((small_h, small_w), dtype=np.uint8)
+        if self.gate_region:
+            rx, ry, rw, rh = self.gate_region
+            x0, y0 = int(rx * small_w), int(ry * small_h)
+            x1, y1 = max(x0 + 1, int((rx + rw) * small_w)), max(y0 + 1, int((ry + rh) * small_h))
+            self._region = (slice(y0, y1), slice(x0, x1))
+        else:
+            self._region = (slice(None), slice(None))
+
+    def should_detect(self, frame):
+        self.active = self._check(frame)
+        return self.active
+
+    def _check(self, frame):
+        self.checked += 1
+        self._ensure_buffers(frame)
+        cv2.resize(frame, (self._small.shape[1], self._small.shape[0]), dst=self._small,
+                   interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if self._background is None:
+            self._background = self._gray.astype(np.float32)
+            self._hold = self.hold_frames
+            return True
+        cv2.convertScaleAbs(self._background, dst=self._background_u8)
+        cv2.absdiff(self._gray, self._background_u8, dst=self._diff)
+        cv2.threshold(self._diff, self.diff_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        cv2.accumulateWeighted(self._gray, self._background, self.learning_rate)
+        region = self._diff[self._region]
+        changed_ratio = cv2.countNonZero(region) / float(region.size)
+        if changed_ratio >= self.min_changed_ratio:
+            self._hold = self.hold_frames
+            return True
+        if self._hold > 0:
+            self._hold -= 1
+            return True
+        self.skipped += 1
+        return False
@@ -0,0 +1,185 @@
+# ocr_backend.py
+import os
+import subprocess
+import tempfile
+import threading
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+import cv2
+import numpy as np
+
+TESSERACT_CMD = r'D:\tesseract\tesseract.exe'
+PLATE_WHITELIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+OCR_ERROR = "OCR_ERROR"
+# 超过每帧截止时间未返回的候选区域，不是识别结果，调用方可以稍后重试
+OCR_TIMEOUT = "OCR_TIMEOUT"
+
+
+class OCRBackend:
+    """OCR 后端基类：子类实现 recognize_batch，一次识别一帧内的全部候选区域"""
+
+    def recognize(self, plate_img):
+        return self.recognize_batch([plate_img])[0]
+
+    def recognize_batch(self, plate_imgs):
+        raise NotImplementedError
+
+    def recognize_batch_uncached(self, plate_imgs):
+        """必须真正识别一次的场合（如轨迹投票）使用，带缓存的后端在此跳过缓存查找"""
+        return self.recognize_batch(plate_imgs)
+
+    def close(self):
+        pass
+
+
+class NullOCRBackend(OCRBackend):
+    """不做识别、始终返回空字符串，用于单独测量检测阶段的耗时"""
+
+    def recognize_batch(self, plate_imgs):
+        return [''] * len(plate_imgs)
+
+
+class TesserocrBackend(OCRBackend):
+    """进程内常驻的 tesseract API 句柄，省去每次识别启动进程的开销"""
+
+    def __init__(self, lang='eng'):
+        import tesserocr
+        self._api = tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM.SINGLE_WORD)
+        self._api.SetVariable('tessedit_char_whitelist', PLATE_WHITELIST)
+        # PyTessBaseAPI 不是线程安全的，多个检测线程共用时需要串行
+        self._lock = threading.Lock()
+
+    def recognize_batch(self, plate_imgs):
+        texts = []
+        with self._lock:
+            for plate_img in plate_imgs:
+                try:
+                    img = np.ascontiguousarray(plate_img)
+                    height, width = img.shape[:2]
+                    bpp = 1 if img.ndim == 2 else img.shape[2]
+                    self._api.SetImageBytes(img.tobytes(), width, height, bpp, width * bpp)
+                    texts.append(self._api.GetUTF8Text().strip())
+                except Exception as e:
+                    logging.error(f"tesserocr 识别错误: {e}")
+                    texts.append(OCR_ERROR)
+        return texts
+
+    def close(self):
+        with self._lock:
+            self._api.End()
+
+
+class TesseractCLIBackend(OCRBackend):
+    """没有 tesserocr 时的后备方案：整批候选区域写入列表文件，只启动一次 tesseract"""
+
+    def __init__(self, cmd=TESSERACT_CMD, timeout=10):
+        self.cmd = cmd if os.path.exists(cmd) else 'tesseract'
+        self.timeout = timeout
+
+    def recognize_batch(self, plate_imgs):
+        if not plate_imgs:
+            return []
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                paths = []
+                for i, plate_img in enumerate(plate_imgs):
+                    path = os.path.join(tmp_dir, f"{i}.png")
+                    cv2.imwrite(path, plate_img)
+                    paths.append(path)
+                list_path = os.path.join(tmp_dir, "crops.txt")
+                with open(list_path, 'w') as f:
+                    f.write("\n".join(paths) + "\n")
+                proc = subprocess.run(
+                    [self.cmd, list_path, 'stdout', '--psm', '8',
+                     '-c', f'tessedit_char_whitelist={PLATE_WHITELIST}'],
+                    capture_output=True, timeout=self.timeout, check=True
+                )
+            # 各图片的识别结果之间以换页符分隔
+            pages = proc.stdout.decode('utf-8', errors='ignore').split('\f')
+            if len(pages) < len(plate_imgs):
+                logging.error(f"tesseract 返回 {len(pages)} 页，期望 {len(plate_imgs)} 页")
+                return [OCR_ERROR] * len(plate_imgs)
+            return [page.strip() for page in pages[:len(plate_imgs)]]
+        except Exception as e:
+            logging.error(f"tesseract 识别错误: {e}")
+            return [OCR_ERROR] * len(plate_imgs)
+
+
+_worker_backend = None
+
+
+def _init_pool_worker(backend_name):
+    global _worker_backend
+    _worker_backend = create_ocr_backend(backend_name)
+
+
+def _recognize_in_worker(plate_imgs):
+    return _worker_backend.recognize_batch(plate_imgs)
+
+
+class PoolOCRBackend(OCRBackend):
+    """把一帧的候选区域分块分发到常驻进程池并按原顺序收集结果。
+
+    frame_timeout 为每帧的截止时间（秒），超时未返回的候选区域直接丢弃，
+    返回 OCR_TIMEOUT，不会阻塞后续帧。
+    """
+
+    def __init__(self, workers=4, frame_timeout=None, backend_name='auto'):
+        self.workers = max(1, workers)
+        self.frame_timeout = frame_timeout
+        self.dropped = 0
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             initializer=_init_pool_worker,
+                                             initargs=(backend_name,))
+
+    def recognize_batch(self, plate_imgs):
+        if not plate_imgs:
+            return []
+        chunk_count = min(self.workers, len(plate_imgs))
+        chunk_size = -(-len(plate_imgs) // chunk_count)
+        chunks = [plate_imgs[i:i + chunk_size] for i in range(0, len(plate_imgs), chunk_size)]
+        futures = [self._executor.submit(_recognize_in_worker, chunk) for chunk in chunks]
+        deadline = None if self.frame_timeout is None else time.monotonic() + self.frame_timeout
+        wait(futures, timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+        texts = []
+        for future, chunk in zip(futures, chunks):
+            if future.done() and not future.cancelled() and future.exception() is None:
+                texts.extend(future.result())
+            else:
+                future.cancel()
+                self.dropped += len(chunk)
+                texts.extend([OCR_TIMEOUT] * len(chunk))
+        return texts
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_ocr_backend(name='auto'):
+    """按名称创建 OCR 后端，auto 优先使用进程内 tesserocr"""
+    if name in ('auto', 'tesserocr'):
+        try:
+            return TesserocrBackend()
+        except Exception as e:
+            if name == 'tesserocr':
+                raise
+            logging.info(f"tesserocr 不可用，改用 tesseract 命令行: {e}")
+    if name in ('auto', 'cli'):
+        return TesseractCLIBackend()
+    if name == 'none':
+        return NullOCRBackend()
+    raise ValueError(f"未知的 OCR 后端: {name}")
+
+
+_default_backend = None
+_default_lock = threading.Lock()
+
+
+def get_ocr_backend():
+    """返回进程内共享的默认 OCR 后端，首次调用时创建"""
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            _default_backend = create_ocr_backend()
+        return _default_backend
@@ -0,0 +1,110 @@
+# ocr_cache.py
+import time
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from ocr_backend import OCRBackend, OCR_ERROR, OCR_TIMEOUT
+
+
+def dhash(plate_img, hash_width=16, hash_height=8):
+    """差值哈希：缩放到 (hash_width+1)×hash_height 的灰度图，比较相邻像素得到整数哈希。
+
+    车牌是横长条，横向取 16 位比正方形的 8×8 更能区分不同字符。
+    """
+    if plate_img.ndim == 3:
+        plate_img = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(plate_img, (hash_width + 1, hash_height), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class OCRCache:
+    """以裁剪图感知哈希为键的 LRU 缓存，汉明距离不超过 max_distance 视为同一张车牌"""
+
+    def __init__(self, max_size=256, max_distance=6, ttl=30.0):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            match = key if key in self._entries else None
+            if match is None and self.max_distance > 0:
+                for cached_key in self._entries:
+                    if bin(cached_key ^ key).count('1') <= self.max_distance:
+                        match = cached_key
+                        break
+            if match is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(match)
+            return self._entries[match][0]
+
+    def put(self, key, plate_text):
+        with self._lock:
+            self._entries[key] = (plate_text, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _expire(self, now):
+        # 条目按最近使用排序而不是写入时间，命中过的旧条目可能排在新条目之后，
+        # 需要逐个检查写入时间；条目数不超过 max_size，与汉明距离查找同为线性扫描
+        expired = [key for key, (_, stored_at) in self._entries.items() if now - stored_at > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+class CachedOCRBackend(OCRBackend):
+    """在任意 OCR 后端前加一层 OCRCache，只把未命中的裁剪图整批交给后端"""
+
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache if cache is not None else OCRCache()
+
+    def recognize_batch(self, plate_imgs):
+        keys = [dhash(img) for img in plate_imgs]
+        texts = [self.cache.get(key) for key in keys]
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if missing:
+            recognized = self.backend.recognize_batch([plate_imgs[i] for i in missing])
+            for i, plate_text in zip(missing, recognized):
+                texts[i] = plate_text
+                self._store(keys[i], plate_text)
+        return texts
+
+    def recognize_batch_uncached(self, plate_imgs):
+        """不查缓存直接识别，结果仍写入缓存。
+
+        轨迹投票要求每次读数是独立的识别结果，同一辆车相邻帧的裁剪图几乎总能命中，
+        命中结果参与投票等于把一次识别计了多票。
+        """
+        texts = self.backend.recognize_batch(plate_imgs)
+        for plate_img, plate_text in zip(plate_imgs, texts):
+            self._store(dhash(plate_img), plate_text)
+        return texts
+
+    def _store(self, key, plate_text):
+        # 识别失败或因超时被丢弃的结果不缓存
+        if plate_text and plate_text not in (OCR_ERROR, OCR_TIMEOUT):
+            self.cache.put(key, plate_text)
+
+    def close(self):
+        self.backend.close()
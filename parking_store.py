@@ -0,0 +1,184 @@
+# parking_store.py
+"""停车进出记录的批量写入。
+
+一批识别结果不论包含多少车牌，都只用固定的几条集合语句完成：
+多行 upsert 车牌、一次查出在场记录、离场和进场各用少量 IN / 多行语句处理，
+进场车位由 space_allocator 按车型原子占用。
+事务由调用方提交，函数直接返回每辆车的处理结果，不再回查数据库。
+
+进出方向由车牌是否有在场记录决定。同一辆车在相邻两批中都出现（轨迹中断、
+多个车道同时看到）时，距离进场或离场不足 min_dwell 的事件视为重复（direction 为
+'duplicate'），不会把刚进场的车判为离场，也不会把刚离场的车判为再次进场。
+
+license_plates.plate_number 需要有唯一索引，upsert 依赖它（storage.py 的 schema 中已包含）。
+"""
+from datetime import timedelta
+from fee_calculator import calculate_fee
+from space_allocator import get_space_allocator, placeholders
+
+# MySQL 语法；SQLite 使用 ON CONFLICT，见 storage.SQLITE_PLATE_UPSERT_SQL
+PLATE_UPSERT_SQL = (
+    "INSERT INTO license_plates (plate_number, plate_color) VALUES (%s, %s) "
+    "ON DUPLICATE KEY UPDATE plate_color = VALUES(plate_color)"
+)
+# 进场后或离场后这段时间内再次识别到同一车牌，视为同一次通过
+MIN_DWELL = timedelta(minutes=2)
+
+
+def _dedupe(events):
+    """同一批中同一车牌的多帧结果只算一次进出，保留最早的一条"""
+    unique = {}
+    for event in events:
+        unique.setdefault(event['plate'], event)
+    return list(unique.values())
+
+
+def upsert_plates(cursor, events, upsert_sql=PLATE_UPSERT_SQL):
+    """多行 upsert 车牌及颜色，返回 {车牌号: plate_id}"""
+    cursor.executemany(
+        upsert_sql,
+        [(event['plate'], event.get('plate_color', 'blue')) for event in events]
+    )
+    numbers = [event['plate'] for event in events]
+    cursor.execute(
+        f"SELECT plate_id, plate_number FROM license_plates WHERE plate_number IN ({placeholders(len(numbers))})",
+        numbers
+    )
+    return {row['plate_number']: row['plate_id'] for row in cursor.fetchall()}
+
+
+def active_sessions(cursor, plate_ids):
+    """一次查出这些车牌的在场记录，返回 {plate_id: 记录}"""
+    if not plate_ids:
+        return {}
+    cursor.execute(
+        "SELECT record_id, plate_id, space_id, entry_time FROM parking_records "
+        f"WHERE status = 'parking' AND plate_id IN ({placeholders(len(plate_ids))})",
+        list(plate_ids)
+    )
+    return {row['plate_id']: row for row in cursor.fetchall()}
+
+
+def recent_exits(cursor, plate_ids, since):
+    """一次查出这些车牌在 since 之后的离场时间，返回 {plate_id: 最近一次离场时间}"""
+    if not plate_ids:
+        return {}
+    cursor.execute(
+        "SELECT plate_id, exit_time FROM parking_records "
+        f"WHERE status = 'completed' AND exit_time >= %s AND plate_id IN ({placeholders(len(plate_ids))})",
+        [since] + list(plate_ids)
+    )
+    exits = {}
+    for row in cursor.fetchall():
+        if row['plate_id'] not in exits or row['exit_time'] > exits[row['plate_id']]:
+            exits[row['plate_id']] = row['exit_time']
+    return exits
+
+
+def _outcome(event, direction, **fields):
+    outcome = {
+        'plate': event['plate'],
+        'type': event.get('type'),
+        'plate_color': event.get('plate_color', 'blue'),
+        'bbox': event.get('bbox'),
+        'lane': event.get('lane'),
+        'direction': direction,
+        'record_id': None,
+        'space_id': None,
+        'entry_time': None,
+        'exit_time': None,
+        'fee': None
+    }
+    outcome.update(fields)
+    return outcome
+
+
+def close_sessions(cursor, exits, rules, allocator):
+    """exits 为 [(事件, 在场记录)]：结束记录、释放车位、写入费用"""
+    if not exits:
+        return []
+    outcomes = []
+    fees = []
+    for event, record in exits:
+        total_amount = calculate_fee(record['entry_time'], event['seen_at'], event.get('plate_color', 'blue'), rules)
+        fees.append((record['record_id'], total_amount, 'unpaid'))
+        outcomes.append(_outcome(event, 'exit', record_id=record['record_id'], space_id=record['space_id'],
+                                 entry_time=record['entry_time'], exit_time=event['seen_at'], fee=total_amount))
+    record_ids = [record['record_id'] for _, record in exits]
+    cases = ' '.join(['WHEN %s THEN %s'] * len(exits))
+    params = [value for event, record in exits for value in (record['record_id'], event['seen_at'])]
+    cursor.execute(
+        f"UPDATE parking_records SET exit_time = CASE record_id {cases} END, status = 'completed' "
+        f"WHERE record_id IN ({placeholders(len(record_ids))})",
+        params + record_ids
+    )
+    space_ids = [record['space_id'] for _, record in exits]
+    cursor.execute(
+        f"UPDATE parking_spaces SET status = 'free' WHERE space_id IN ({placeholders(len(space_ids))})",
+        space_ids
+    )
+    cursor.executemany(
+        "INSERT INTO parking_fees (record_id, total_amount, payment_status) VALUES (%s, %s, %s)",
+        fees
+    )
+    allocator.release(space_ids)
+    return outcomes
+
+
+def open_sessions(cursor, entries, allocator):
+    """entries 为 [(事件, plate_id)]：按车型占用车位并批量建立在场记录"""
+    if not entries:
+        return []
+    spaces = allocator.claim(cursor, [event.get('type') for event, _ in entries])
+    admitted = [(entry, space_id) for entry, space_id in zip(entries, spaces) if space_id is not None]
+    outcomes = [_outcome(event, 'rejected', entry_time=event['seen_at'])
+                for (event, _), space_id in zip(entries, spaces) if space_id is None]
+    if not admitted:
+        return outcomes
+    cursor.executemany(
+        "INSERT INTO parking_records (plate_id, space_id, entry_time, status) VALUES (%s, %s, %s, %s)",
+        [(plate_id, space_id, event['seen_at'], 'parking') for (event, plate_id), space_id in admitted]
+    )
+    space_ids = [space_id for _, space_id in admitted]
+    # 多行 INSERT 的自增 id 不保证连续，按车位取回本批新建的记录号
+    cursor.execute(
+        "SELECT record_id, space_id FROM parking_records "
+        f"WHERE status = 'parking' AND space_id IN ({placeholders(len(space_ids))})",
+        space_ids
+    )
+    record_ids = {row['space_id']: row['record_id'] for row in cursor.fetchall()}
+    outcomes[:0] = [_outcome(event, 'entry', record_id=record_ids.get(space_id), space_id=space_id,
+                             entry_time=event['seen_at'])
+                    for (event, _), space_id in admitted]
+    return outcomes
+
+
+def record_gate_events(cursor, events, rules, allocator=None, upsert_sql=PLATE_UPSERT_SQL, min_dwell=MIN_DWELL):
+    """批量处理一组识别事件（需带 plate 和 seen_at），返回各车辆的处理结果。
+
+    cursor 需为 dictionary=True 的游标，调用方负责提交或回滚事务；
+    回滚时应调用 allocator.invalidate()。
+    """
+    allocator = allocator if allocator is not None else get_space_allocator()
+    events = _dedupe(events)
+    if not events:
+        return []
+    plate_ids = upsert_plates(cursor, events, upsert_sql)
+    sessions = active_sessions(cursor, plate_ids.values())
+    departed = recent_exits(cursor, plate_ids.values(), min(event['seen_at'] for event in events) - min_dwell)
+    exits, entries, duplicates = [], [], []
+    for event in events:
+        plate_id = plate_ids[event['plate']]
+        session = sessions.get(plate_id)
+        if session is not None:
+            if event['seen_at'] - session['entry_time'] < min_dwell:
+                duplicates.append(_outcome(event, 'duplicate', record_id=session['record_id'],
+                                           space_id=session['space_id'], entry_time=session['entry_time']))
+            else:
+                exits.append((event, session))
+        elif plate_id in departed and event['seen_at'] - departed[plate_id] < min_dwell:
+            duplicates.append(_outcome(event, 'duplicate', exit_time=departed[plate_id]))
+        else:
+            entries.append((event, plate_id))
+    return (close_sessions(cursor, exits, rules, allocator) + open_sessions(cursor, entries, allocator)
+            + duplicates)
@@ -0,0 +1,180 @@
+# persistence_worker.py
+import os
+import json
+import queue
+import logging
+import threading
+from datetime import datetime
+from PyQt5.QtCore import QThread, pyqtSignal
+from fee_calculator import load_billing_rules
+from storage import get_storage
+from stage_timing import stage_timers
+
+# 停止时来不及写入数据库的事件暂存于此，下次启动时先补写
+SPOOL_PATH = 'persistence_spool.jsonl'
+
+
+class PersistenceWorker(QThread):
+    """后台入库线程：界面线程 submit() 检测结果后立即返回，不等待 MySQL。
+
+    结果进入有界队列，工作线程把一段时间内的多条事件合并成一个事务写入，
+    写入失败时按指数退避重试。每辆车的处理结果（进场/离场、分配车位、费用）
+    通过 event_saved 发回界面线程；数据库持续不可用时只在故障开始和恢复时各报告一次。
+    队列满时丢弃的事件计入 dropped 并通过 events_dropped 报告累计数。
+
+    stop(timeout) 最多等待 timeout 秒：超时或重试中被停止时，未写入的事件写到
+    spool_path，下次启动后先补写这些事件。
+    """
+    event_saved = pyqtSignal(dict)
+    events_failed = pyqtSignal(int, str)
+    events_dropped = pyqtSignal(int)
+    status_changed = pyqtSignal(bool, str)
+
+    def __init__(self, max_queue=256, batch_size=32, batch_wait=0.2,
+                 max_retries=5, backoff=0.5, max_backoff=10.0, spool_path=SPOOL_PATH, parent=None):
+        super().__init__(parent)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.spool_path = spool_path
+        self.dropped = 0
+        self.is_running = True
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._healthy = True
+        # stop() 时置位，打断重试前的退避等待
+        self._stopping = threading.Event()
+        self._spool_lock = threading.Lock()
+
+    def submit(self, results):
+        """放入待入库的检测结果；队列已满时丢弃并计数，从不阻塞调用方"""
+        for result in results:
+            try:
+                self._queue.put_nowait(dict(result, seen_at=datetime.now()))
+            except queue.Full:
+                self.dropped += 1
+                logging.warning(f"入库队列已满，丢弃车牌 {result.get('plate')}（累计丢弃 {self.dropped}）")
+                self.events_dropped.emit(self.dropped)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stop(self, timeout=5.0):
+        """停止并最多等待 timeout 秒，超时后队列中剩余的事件写入 spool，返回线程是否已结束"""
+        self.is_running = False
+        self._stopping.set()
+        if self.wait(int(timeout * 1000)):
+            return True
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._spool(remaining)
+        logging.warning(f"入库线程 {timeout} 秒内未结束，{len(remaining)} 条事件已暂存到 {self.spool_path}")
+        return False
+
+    def run(self):
+        self._replay_spool()
+        # 停止后先把队列中剩余的事件写完
+        while self.is_running or not self._queue.empty():
+            events = self._take_batch()
+            if events:
+                self._write_with_retry(events)
+
+    def _take_batch(self):
+        try:
+            events = [self._queue.get(timeout=self.batch_wait)]
+        except queue.Empty:
+            return []
+        while len(events) < self.batch_size:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def _write_with_retry(self, events, spool_on_failure=False):
+        """spool_on_failure 为 True 时（补写 spool 中的事件）重试用尽后写回 spool，而不是丢弃"""
+        attempt = 0
+        while True:
+            try:
+                with stage_timers.stage('db_write', 'persistence'):
+                    outcomes = self._write(events)
+                break
+            except Exception as e:
+                attempt += 1
+                if self._healthy:
+                    self._healthy = False
+                    self.status_changed.emit(False, str(e))
+                    logging.error(f"数据库写入失败，开始重试: {e}")
+                if not self.is_running:
+                    # 正在停止，不再退避重试，留到下次启动时补写
+                    self._spool(events)
+                    logging.error(f"数据库写入失败，{len(events)} 条事件已暂存到 {self.spool_path}: {e}")
+                    return
+                if attempt > self.max_retries and spool_on_failure:
+                    self._spool(events)
+                    logging.error(f"数据库写入放弃，{len(events)} 条暂存事件写回 {self.spool_path}: {e}")
+                    return
+                if attempt > self.max_retries:
+                    logging.error(f"数据库写入放弃，丢弃 {len(events)} 条事件: {e}")
+                    self.events_failed.emit(len(events), str(e))
+                    return
+                self._stopping.wait(min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if not self._healthy:
+            self._healthy = True
+            self.status_changed.emit(True, "")
+            logging.info("数据库写入已恢复")
+        for outcome in outcomes:
+            self.event_saved.emit(outcome)
+
+    def _write(self, events):
+        """一个事务内处理一批事件，提交成功后才返回各车辆的处理结果"""
+        return get_storage().record_gate_events(events, load_billing_rules())
+
+    def _spool(self, events):
+        if not events:
+            return
+        with self._spool_lock:
+            with open(self.spool_path, 'a', encoding='utf-8') as f:
+                for event in events:
+                    event = dict(event, seen_at=event['seen_at'].isoformat())
+                    f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+    def _replay_spool(self):
+        """补写上次停止时暂存的事件；数据库仍不可用时写回 spool，留到下次启动。
+
+        补写前把 spool 移到 .replay 文件，全部批次写入或写回 spool 后才删除，
+        补写中途进程退出时下次启动会重新补写（已写入的事件按最短停留时间判为重复，不会重复进出）。
+        """
+        replay_path = self.spool_path + '.replay'
+        with self._spool_lock:
+            if os.path.exists(self.spool_path):
+                if os.path.exists(replay_path):
+                    # 上次补写未完成，又有新的暂存事件：合并到一个文件中补写
+                    with open(self.spool_path, 'r', encoding='utf-8') as src, \
+                            open(replay_path, 'a', encoding='utf-8') as dst:
+                        dst.write(src.read())
+                    os.remove(self.spool_path)
+                else:
+                    os.replace(self.spool_path, replay_path)
+        if not os.path.exists(replay_path):
+            return
+        events = []
+        try:
+            with open(replay_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        event = json.loads(line)
+                        event['seen_at'] = datetime.fromisoformat(event['seen_at'])
+                        events.append(event)
+        except Exception as e:
+            logging.error(f"读取入库暂存文件错误: {e}")
+            return
+        logging.info(f"补写上次暂存的 {len(events)} 条事件")
+        for i in range(0, len(events), self.batch_size):
+            self._write_with_retry(events[i:i + self.batch_size], spool_on_failure=True)
+        os.remove(replay_path)
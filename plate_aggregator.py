@@ -0,0 +1,109 @@
+# plate_aggregator.py
+import threading
+from datetime import datetime
+
+
+def normalize_plate(plate):
+    """归一化车牌号：转大写并去掉空格、点号等非字母数字字符"""
+    return ''.join(c for c in plate.upper() if c.isalnum())
+
+
+class PlateAggregator:
+    """识别结果汇总，每次更新 O(1)，识别过程中可随时查询。
+
+    带 track_id 的结果按轨迹记录：轨迹投票过程中车牌号会变化，记录中的车牌号随之就地更新，
+    中间读数不会变成单独的车牌；没有 track_id 的结果按归一化车牌号记录。
+    另有按归一化车牌号的索引（车牌号 → 记录键集合），轨迹车牌号变化时随之迁移，
+    get() 只合并该车牌号下的记录，不扫描全部记录。
+    查询时把最终车牌号相同的记录合并，保存首次/末次出现的帧序号、视频时间（秒）和时钟时间、
+    出现次数，以及得分最高的一次检测的 bbox。
+    """
+
+    def __init__(self, fps=None):
+        self.fps = fps
+        self._records = {}
+        self._by_plate = {}
+        self._lock = threading.Lock()
+
+    def update(self, results, frame_index):
+        now = datetime.now()
+        video_time = frame_index / self.fps if self.fps else None
+        with self._lock:
+            for result in results:
+                plate = normalize_plate(result['plate'])
+                if not plate:
+                    continue
+                key = ('track', result['track_id']) if 'track_id' in result else ('plate', plate)
+                x, y, w, h = result['bbox']
+                score = result.get('score', w * h)
+                record = self._records.get(key)
+                if record is None:
+                    self._records[key] = {
+                        'plate': plate,
+                        'type': result['type'],
+                        'plate_color': result.get('plate_color'),
+                        'bbox': result['bbox'],
+                        'best_score': score,
+                        'hits': 1,
+                        'first_frame': frame_index,
+                        'last_frame': frame_index,
+                        'first_time': video_time,
+                        'last_time': video_time,
+                        'first_seen': now,
+                        'last_seen': now,
+                        'track_ids': {result['track_id']} if 'track_id' in result else set()
+                    }
+                    self._by_plate.setdefault(plate, set()).add(key)
+                    continue
+                if record['plate'] != plate:
+                    self._reindex(key, record['plate'], plate)
+                    record['plate'] = plate
+                record['hits'] += 1
+                record['last_frame'] = frame_index
+                record['last_time'] = video_time
+                record['last_seen'] = now
+                if score > record['best_score']:
+                    record['best_score'] = score
+                    record['bbox'] = result['bbox']
+                    record['type'] = result['type']
+                    record['plate_color'] = result.get('plate_color', record['plate_color'])
+
+    def _reindex(self, key, old_plate, new_plate):
+        keys = self._by_plate[old_plate]
+        keys.discard(key)
+        if not keys:
+            del self._by_plate[old_plate]
+        self._by_plate.setdefault(new_plate, set()).add(key)
+
+    def get(self, plate):
+        with self._lock:
+            keys = self._by_plate.get(normalize_plate(plate))
+            return self._merge([self._records[key] for key in keys]) if keys else None
+
+    def snapshot(self):
+        """按首次出现顺序返回各车牌的汇总记录（副本）"""
+        with self._lock:
+            records = [self._merge([self._records[key] for key in keys]) for keys in self._by_plate.values()]
+        return sorted(records, key=lambda r: r['first_frame'])
+
+    def __len__(self):
+        return len(self._by_plate)
+
+    @staticmethod
+    def _merge(records):
+        """合并最终车牌号相同的记录：同一辆车被拆成多条轨迹或混有不带轨迹的结果"""
+        first = min(records, key=lambda r: r['first_frame'])
+        last = max(records, key=lambda r: r['last_frame'])
+        best = max(records, key=lambda r: r['best_score'])
+        merged = dict(best)
+        merged.update({
+            'hits': sum(r['hits'] for r in records),
+            'first_frame': first['first_frame'],
+            'first_time': first['first_time'],
+            'first_seen': first['first_seen'],
+            'last_frame': last['last_frame'],
+            'last_time': last['last_time'],
+            'last_seen': last['last_seen'],
+            'track_ids': sorted(set().union(*(r['track_ids'] for r in records)))
+        })
+        return merged
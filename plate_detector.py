@@ -0,0 +1,392 @@
+# plate_detector.py
+import cv2
+import numpy as np
+from ocr_backend import get_ocr_backend
+from camera_config import DEFAULT_CAMERA_CONFIG
+from stage_timing import stage_timers, DEFAULT_LANE
+
+MAX_WIDTH = 1000
+COARSE_WIDTH = 480
+EARLY_EXIT_CONFIDENCE = 0.9
+# locate() 不做 OCR，金字塔模式下以候选的车牌相似度得分（plate_score）作为提前结束条件
+EARLY_EXIT_SCORE = 0.8
+PLATE_ASPECT = (2, 5)
+PLATE_ASPECT_IDEAL = 3.14
+# 粗定位分辨率低、边缘易断裂，放宽最小尺寸和宽高比，由精定位再按原阈值筛选
+COARSE_SIZE_SLACK = 0.5
+COARSE_ASPECT = (1.5, 6)
+REFINE_PADDING = 0.25
+# 车牌底色的 HSV 色相区间（OpenCV 色相范围 0~180），饱和度/亮度过低的像素（白字、阴影）不参与统计
+PLATE_HUE_RANGES = {'yellow': (15, 35), 'green': (35, 90), 'blue': (100, 130)}
+PLATE_COLOR_MIN_SV = (60, 50)
+PLATE_COLOR_MIN_RATIO = 0.15
+DEFAULT_PLATE_COLOR = 'blue'
+# 车牌区域内 Canny 边缘像素的典型占比（字符笔画密集），用于候选打分
+PLATE_EDGE_DENSITY = 0.2
+
+
+class PlateDetector:
+    """无界面的车牌检测引擎，图片识别和视频识别共用同一套流程。
+
+    灰度、模糊、二值化、边缘四块工作缓冲区在多次调用之间复用，按工作尺寸各保留一组
+    （金字塔模式下粗定位和整帧回退扫描各用一组），只有出现新的尺寸时才分配。缓冲区属于实例本身，
+    多线程并发检测时每个线程应使用各自的 PlateDetector。
+
+    camera 为 camera_config.load_camera_config() 返回的配置：有 ROI 时先裁剪到
+    ROI 的外接矩形再缩放和滤波，多边形之外的边缘被屏蔽；返回的 bbox 均为整帧坐标。
+    lane 为各阶段耗时统计（stage_timing）所用的车道名。
+
+    通过尺寸和宽高比筛选的轮廓先按车牌相似度打分，再做 bbox 非极大值抑制（nms_iou），
+    每帧只保留得分最高的 top_k 个候选送去 OCR，候选和识别结果都带 score。
+    生成 OCR 裁剪图的同时按彩色区域的色相直方图判断车牌颜色（plate_color）。
+
+    pyramid 模式（默认取摄像头配置的 pyramid 项）先在 coarse_width 宽的小图上粗找
+    候选区域，再只对这些区域在原始分辨率下精定位，OCR 用原图裁剪；
+    detect_frame() 逐个区域识别，出现置信度达到 early_exit_confidence 的车牌即停止；
+    locate()（视频轨迹跟踪使用）逐个区域精定位，出现得分达到 early_exit_score 的候选即停止。
+    粗定位在小图上容易漏掉小车牌，全部区域处理完仍未提前结束时再按 max_width 整帧扫描一次，
+    召回不低于单尺度模式。
+    """
+
+    def __init__(self, max_width=MAX_WIDTH, ocr=None, camera=None, lane=DEFAULT_LANE,
+                 pyramid=None, coarse_width=COARSE_WIDTH, early_exit_confidence=EARLY_EXIT_CONFIDENCE,
+                 early_exit_score=EARLY_EXIT_SCORE):
+        self.max_width = max_width
+        self.lane = lane
+        self.ocr = ocr if ocr is not None else get_ocr_backend()
+        self.camera = camera if camera is not None else DEFAULT_CAMERA_CONFIG
+        self.min_plate_w, self.min_plate_h = self.camera.get('min_plate_size') or (0, 0)
+        self.max_plate_w, self.max_plate_h = self.camera.get('max_plate_size') or (float('inf'), float('inf'))
+        # RETR_TREE 会为同一块车牌返回内外多层轮廓，external 只取最外层
+        self.contour_mode = (cv2.RETR_EXTERNAL if self.camera.get('contour_mode') == 'external'
+                             else cv2.RETR_TREE)
+        self.nms_iou = self.camera.get('nms_iou', DEFAULT_CAMERA_CONFIG['nms_iou'])
+        self.top_k = self.camera.get('top_k', DEFAULT_CAMERA_CONFIG['top_k'])
+        self.pyramid = pyramid if pyramid is not None else bool(self.camera.get('pyramid'))
+        self.coarse_width = coarse_width
+        self.early_exit_confidence = early_exit_confidence
+        self.early_exit_score = early_exit_score
+        self._shape = None
+        self._buffer_sets = {}
+        self._resized = None
+        self._gray = None
+        self._blurred = None
+        self._thresh = None
+        self._edges = None
+        self._roi_mask = None
+
+    def _ensure_buffers(self, height, width, roi_origin, scale):
+        if self._shape == (height, width):
+            return
+        buffers = self._buffer_sets.get((height, width))
+        if buffers is None:
+            # 尺寸各异的图片批量处理时不无限增长，只保留最近的两组
+            while len(self._buffer_sets) >= 2:
+                self._buffer_sets.pop(next(iter(self._buffer_sets)))
+            roi_mask = None
+            roi = self.camera.get('roi')
+            if roi:
+                polygon = (np.array(roi, dtype=np.float32) - roi_origin) * scale
+                roi_mask = np.zeros((height, width), dtype=np.uint8)
+                cv2.fillPoly(roi_mask, [polygon.astype(np.int32)], 255)
+            buffers = self._buffer_sets[(height, width)] = (
+                np.empty((height, width, 3), dtype=np.uint8),
+                np.empty((height, width), dtype=np.uint8),
+                np.empty((height, width), dtype=np.uint8),
+                np.empty((height, width), dtype=np.uint8),
+                np.empty((height, width), dtype=np.uint8),
+                roi_mask
+            )
+        self._shape = (height, width)
+        self._resized, self._gray, self._blurred, self._thresh, self._edges, self._roi_mask = buffers
+
+    def _roi_rect(self, frame):
+        height, width = frame.shape[:2]
+        roi = self.camera.get('roi')
+        if not roi:
+            return 0, 0, width, height
+        xs = [p[0] for p in roi]
+        ys = [p[1] for p in roi]
+        x0, y0 = max(0, int(min(xs))), max(0, int(min(ys)))
+        x1, y1 = min(width, int(max(xs))), min(height, int(max(ys)))
+        return x0, y0, max(1, x1 - x0), max(1, y1 - y0)
+
+    def _prepare(self, frame, max_width=None):
+        """裁剪到 ROI 并缩放到工作尺寸，返回 (工作图像, ROI 左上角, 缩放比例)。
+
+        缩放比例按整帧宽度计算，与是否配置 ROI 无关，车牌尺寸阈值因此保持一致。
+        工作图像可能是缓冲区视图，下次调用会被覆盖。
+        """
+        rx, ry, rw, rh = self._roi_rect(frame)
+        region = frame[ry:ry + rh, rx:rx + rw]
+        scale = min(1.0, (max_width or self.max_width) / frame.shape[1])
+        width, height = max(1, int(rw * scale)), max(1, int(rh * scale))
+        self._ensure_buffers(height, width, (rx, ry), scale)
+        if scale < 1.0:
+            cv2.resize(region, (width, height), dst=self._resized)
+            return self._resized, (rx, ry), scale
+        return region, (rx, ry), scale
+
+    def _plate_like(self, w, h, size_slack=1.0, aspect_range=PLATE_ASPECT):
+        """w, h 为 max_width 工作坐标下的尺寸；size_slack < 1 时放宽最小尺寸"""
+        aspect_ratio = w / float(h)
+        return (aspect_range[0] < aspect_ratio < aspect_range[1]
+                and self.min_plate_w * size_slack < w <= self.max_plate_w
+                and self.min_plate_h * size_slack < h <= self.max_plate_h)
+
+    def detect(self, frames):
+        """批量检测，返回与 frames 一一对应的检测结果列表"""
+        return [self.detect_frame(frame) for frame in frames]
+
+    def detect_frame(self, frame):
+        if not self.pyramid:
+            return self.recognize(self.locate(frame))
+        plates = []
+        for candidates in self._refined_regions(frame):
+            results = self.recognize(candidates)
+            plates.extend(results)
+            if any(r['confidence'] >= self.early_exit_confidence for r in results):
+                break
+        return plates
+
+    def locate(self, frame):
+        """定位候选车牌区域，返回带 bbox、车型和 OCR 裁剪图的候选列表，不做 OCR"""
+        if frame is None:
+            return []
+        if self.pyramid:
+            candidates = []
+            for region in self._refined_regions(frame):
+                candidates.extend(region)
+                if any(c['score'] >= self.early_exit_score for c in region):
+                    break
+            kept = self._consolidate([(c['score'], c['bbox']) for c in candidates], self.top_k)
+            kept_boxes = [box for _, box in kept]
+            return [c for c in candidates if c['bbox'] in kept_boxes]
+        return self._scan(frame, self.max_width)
+
+    def _scan(self, frame, max_width, coarse=False):
+        """在缩放到 max_width 的整帧（ROI）上找候选框。
+
+        尺寸阈值统一换算到 self.max_width 工作坐标下比较；coarse 时放宽尺寸和宽高比，
+        且不生成裁剪图，只用来给精定位圈出区域。
+        """
+        stage = stage_timers.stage
+        lane = self.lane
+        with stage('resize', lane):
+            img, (rx, ry), scale = self._prepare(frame, max_width)
+        # 本次缩放相对 max_width 工作坐标的比例，非金字塔模式下为 1
+        to_working = min(1.0, self.max_width / frame.shape[1]) / scale
+        size_slack, aspect_range = (COARSE_SIZE_SLACK, COARSE_ASPECT) if coarse else (1.0, PLATE_ASPECT)
+        with stage('cvtColor', lane):
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        with stage('GaussianBlur', lane):
+            blurred = cv2.GaussianBlur(gray, (5, 5), 0, dst=self._blurred)
+        with stage('adaptiveThreshold', lane):
+            thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                           cv2.THRESH_BINARY, 11, 2, dst=self._thresh)
+        with stage('Canny', lane):
+            edges = cv2.Canny(thresh, 50, 150, edges=self._edges)
+            if self._roi_mask is not None:
+                cv2.bitwise_and(edges, self._roi_mask, dst=edges)
+        with stage('findContours', lane):
+            contours, _ = cv2.findContours(edges, self.contour_mode, cv2.CHAIN_APPROX_SIMPLE)
+        candidates = []
+        with stage('candidates', lane):
+            boxes = self._scored_boxes(contours, edges, to_working, size_slack, aspect_range)
+            # 粗定位只做去重，保留全部区域给精定位
+            for score, (x, y, w, h) in self._consolidate(boxes, None if coarse else self.top_k):
+                candidate = {
+                    # 工作坐标映射回整帧坐标
+                    'bbox': (rx + int(x / scale), ry + int(y / scale), int(w / scale), int(h / scale)),
+                    'type': 'small_car' if w * to_working < 400 else 'large_car',
+                    'score': score
+                }
+                if not coarse:
+                    candidate['crop'] = cv2.convertScaleAbs(gray[y:y + h, x:x + w], alpha=1.5, beta=0)
+                    candidate['plate_color'] = classify_plate_color(img[y:y + h, x:x + w])
+                candidates.append(candidate)
+        return candidates
+
+    def _scored_boxes(self, contours, edges, to_working, size_slack=1.0, aspect_range=PLATE_ASPECT):
+        """筛出像车牌的外接框，返回 [(得分, (x, y, w, h))]，坐标与 edges 相同"""
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if self._plate_like(w * to_working, h * to_working, size_slack, aspect_range):
+                density = cv2.countNonZero(edges[y:y + h, x:x + w]) / float(w * h)
+                boxes.append((plate_score(w, h, density), (x, y, w, h)))
+        return boxes
+
+    def _consolidate(self, boxes, limit):
+        """按得分做非极大值抑制，limit 不为 None 时只保留前 limit 个"""
+        kept = non_max_suppression(boxes, self.nms_iou)
+        return kept if limit is None else kept[:limit]
+
+    def _refined_regions(self, frame):
+        """金字塔模式：粗找区域后逐个在原始分辨率下精定位，每次产出一个区域的候选列表。
+
+        生成器按需推进，detect_frame() / locate() 提前结束时剩余区域不再处理；
+        全部区域处理完后，最后产出整帧扫描中与已产出候选不重叠的候选（没有则不产出）。
+        """
+        regions = self._scan(frame, self.coarse_width, coarse=True)
+        # 宽高比越接近标准车牌越先处理，提前结束时省下的工作越多
+        regions.sort(key=lambda c: abs(c['bbox'][2] / float(c['bbox'][3]) - PLATE_ASPECT_IDEAL))
+        to_working = min(1.0, self.max_width / frame.shape[1])
+        frame_h, frame_w = frame.shape[:2]
+        refined = []
+        found = []
+        for region in regions:
+            x, y, w, h = region['bbox']
+            # 相邻的粗候选常落在同一块车牌上，已精定位过的区域不再重复处理
+            if any(_contains(box, (x + w // 2, y + h // 2)) for box in refined):
+                continue
+            pad_x, pad_y = int(w * REFINE_PADDING), int(h * REFINE_PADDING)
+            x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+            x1, y1 = min(frame_w, x + w + pad_x), min(frame_h, y + h + pad_y)
+            refined.append((x0, y0, x1 - x0, y1 - y0))
+            with stage_timers.stage('refine', self.lane):
+                candidates = self._refine(frame[y0:y1, x0:x1], (x0, y0), to_working)
+            if candidates:
+                found.extend(c['bbox'] for c in candidates)
+                yield candidates
+        # 没有足够可信的候选：小车牌可能在粗定位中被漏掉，回退到整帧扫描
+        fallback = [c for c in self._scan(frame, self.max_width)
+                    if all(bbox_iou(c['bbox'], box) <= self.nms_iou for box in found)]
+        if fallback:
+            yield fallback
+
+    def _refine(self, patch, origin, to_working):
+        gray = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+        thresh = cv2.adaptiveThreshold(cv2.GaussianBlur(gray, (5, 5), 0), 255,
+                                       cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        edges = cv2.Canny(thresh, 50, 150)
+        roi = self.camera.get('roi')
+        if roi:
+            # 与单尺度模式一样屏蔽 ROI 多边形之外的边缘，patch 坐标 = 整帧坐标 - origin
+            mask = np.zeros(edges.shape, dtype=np.uint8)
+            polygon = np.array(roi, dtype=np.float32) - np.array(origin, dtype=np.float32)
+            cv2.fillPoly(mask, [polygon.astype(np.int32)], 255)
+            cv2.bitwise_and(edges, mask, dst=edges)
+        contours, _ = cv2.findContours(edges, self.contour_mode, cv2.CHAIN_APPROX_SIMPLE)
+        candidates = []
+        for score, (x, y, w, h) in self._consolidate(self._scored_boxes(contours, edges, to_working), self.top_k):
+            candidates.append({
+                'bbox': (origin[0] + x, origin[1] + y, w, h),
+                'type': 'small_car' if w * to_working < 400 else 'large_car',
+                'score': score,
+                'crop': cv2.convertScaleAbs(gray[y:y + h, x:x + w], alpha=1.5, beta=0),
+                'plate_color': classify_plate_color(patch[y:y + h, x:x + w])
+            })
+        return candidates
+
+    def recognize_batch(self, plate_imgs):
+        """整批 OCR 并计入本车道的 ocr 阶段耗时"""
+        with stage_timers.stage('ocr', self.lane):
+            return self.ocr.recognize_batch(plate_imgs)
+
+    def recognize_batch_uncached(self, plate_imgs):
+        """同 recognize_batch，但跳过 OCR 缓存，供轨迹投票使用"""
+        with stage_timers.stage('ocr', self.lane):
+            return self.ocr.recognize_batch_uncached(plate_imgs)
+
+    def recognize(self, candidates):
+        """对候选区域整批 OCR，返回通过校验的检测结果"""
+        if not candidates:
+            return []
+        texts = self.recognize_batch([c['crop'] for c in candidates])
+        plates = []
+        for candidate, plate_text in zip(candidates, texts):
+            if is_valid_plate(plate_text):
+                plates.append({
+                    'plate': plate_text,
+                    'type': candidate['type'],
+                    'bbox': candidate['bbox'],
+                    'score': candidate.get('score', 0.0),
+                    'plate_color': candidate.get('plate_color', DEFAULT_PLATE_COLOR),
+                    'confidence': plate_confidence(plate_text)
+                })
+        return plates
+
+    def recognize_plate_text(self, plate_img):
+        return self.ocr.recognize(plate_img)
+
+
+def bbox_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / float(union) if union > 0 else 0.0
+
+
+def plate_score(w, h, edge_density):
+    """车牌相似度 0~1：宽高比接近标准车牌、框内边缘密度接近字符区域的典型值"""
+    aspect_term = max(0.0, 1.0 - abs(w / float(h) - PLATE_ASPECT_IDEAL) / 2.0)
+    density_term = max(0.0, 1.0 - abs(edge_density - PLATE_EDGE_DENSITY) / PLATE_EDGE_DENSITY)
+    return round(aspect_term * density_term, 4)
+
+
+def non_max_suppression(boxes, iou_threshold):
+    """boxes 为 [(得分, (x, y, w, h))]，按得分从高到低保留与已保留框 IoU 不超过阈值的框"""
+    kept = []
+    for score, box in sorted(boxes, key=lambda item: item[0], reverse=True):
+        if all(bbox_iou(box, other) <= iou_threshold for _, other in kept):
+            kept.append((score, box))
+    return kept
+
+
+def _contains(box, point):
+    x, y, w, h = box
+    return x <= point[0] < x + w and y <= point[1] < y + h
+
+
+def is_valid_plate(plate_text):
+    return (len(plate_text) > 5 and any(c.isalpha() for c in plate_text)
+            and any(c.isdigit() for c in plate_text))
+
+
+def classify_plate_color(region):
+    """按 BGR 车牌区域（可以是整帧的视图）的色相直方图判断底色：blue / green / yellow。
+
+    只在足够饱和、足够亮的像素上统计，有色像素太少时返回默认的 blue。
+    """
+    if region is None or region.size == 0:
+        return DEFAULT_PLATE_COLOR
+    hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
+    min_s, min_v = PLATE_COLOR_MIN_SV
+    mask = cv2.inRange(hsv, (0, min_s, min_v), (180, 255, 255))
+    hist = cv2.calcHist([hsv], [0], mask, [180], [0, 180]).ravel()
+    colored = hist.sum()
+    if colored < hsv.shape[0] * hsv.shape[1] * PLATE_COLOR_MIN_RATIO:
+        return DEFAULT_PLATE_COLOR
+    votes = {color: hist[low:high].sum() for color, (low, high) in PLATE_HUE_RANGES.items()}
+    color = max(votes, key=votes.get)
+    return color if votes[color] >= colored * 0.5 else DEFAULT_PLATE_COLOR
+
+
+def plate_confidence(plate_text):
+    """按车牌号格式给出 0~1 的置信度：7 位、首位字母、全部为字母数字、末尾含数字"""
+    if not is_valid_plate(plate_text):
+        return 0.0
+    score = 0.4 if len(plate_text) == 7 else 0.2
+    if plate_text[0].isalpha():
+        score += 0.2
+    if plate_text[1].isalpha():
+        score += 0.1
+    if plate_text.isalnum():
+        score += 0.2
+    if any(c.isdigit() for c in plate_text[2:]):
+        score += 0.1
+    return round(score, 2)
+
+
+def draw_boxes(frame, results, scale=1.0):
+    """在帧上原地绘制检测框和车牌号，scale 为帧相对整帧坐标的缩放比例"""
+    for result in results:
+        x, y, w, h = (int(v * scale) for v in result['bbox'])
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.putText(frame, result['plate'], (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    return frame
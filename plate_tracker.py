@@ -0,0 +1,201 @@
+# plate_tracker.py
+from collections import Counter, deque
+from itertools import count
+from plate_detector import is_valid_plate, bbox_iou, DEFAULT_PLATE_COLOR
+from ocr_backend import OCR_TIMEOUT
+
+
+def _centroid_distance(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    dx = (ax + aw / 2.0) - (bx + bw / 2.0)
+    dy = (ay + ah / 2.0) - (by + bh / 2.0)
+    return (dx * dx + dy * dy) ** 0.5
+
+
+def vote_plate(readings):
+    """逐字符多数投票：先取出现最多的长度，再在该长度的读数中逐位投票"""
+    if not readings:
+        return ''
+    length = Counter(len(r) for r in readings).most_common(1)[0][0]
+    same_length = [r for r in readings if len(r) == length]
+    return ''.join(Counter(chars).most_common(1)[0][0] for chars in zip(*same_length))
+
+
+class Track:
+    def __init__(self, track_id, candidate, frame_index):
+        self.track_id = track_id
+        self.bbox = candidate['bbox']
+        self.type = candidate['type']
+        self.score = candidate.get('score', 0.0)
+        self.colors = Counter()
+        self.add_color(candidate)
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.hits = 1
+        self.missed = 0
+        self.ocr_attempts = 0
+        self.ocr_timeouts = 0
+        self.last_ocr_frame = None
+        self.readings = []
+        self.plate = ''
+        self.reported = False
+
+    def add_color(self, candidate):
+        color = candidate.get('plate_color')
+        if color:
+            self.colors[color] += 1
+
+    @property
+    def plate_color(self):
+        """各帧颜色判断中出现最多的一种，单帧受光照影响的误判会被投票掉"""
+        return self.colors.most_common(1)[0][0] if self.colors else DEFAULT_PLATE_COLOR
+
+    def to_result(self):
+        return {
+            'plate': self.plate,
+            'type': self.type,
+            'bbox': self.bbox,
+            'score': self.score,
+            'plate_color': self.plate_color,
+            'track_id': self.track_id,
+            'hits': self.hits,
+            'readings': len(self.readings),
+            'first_frame': self.first_frame,
+            'last_frame': self.last_frame
+        }
+
+
+class PlateTracker:
+    """按 IoU / 质心距离把各帧的候选区域关联成轨迹，每条轨迹只 OCR 少数几次。
+
+    update() 返回本帧需要 OCR 的 (轨迹, 候选区域)，识别结果通过 add_reading()
+    回填，轨迹的车牌号由各次读数逐字符投票得出。
+    结束的轨迹暂存在 finished 中（最多 max_finished 条），由 finish_all() 取走。
+
+    每条轨迹在投票稳定（读数已满或识别次数用完）或轨迹结束时产生一次出入事件，
+    由 pop_events() 取走，入库只需处理这些事件，不必处理每帧的结果。
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=10, ocr_per_track=3,
+                 max_ocr_attempts=6, ocr_retry_interval=2, max_finished=256):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.ocr_per_track = ocr_per_track
+        self.max_ocr_attempts = max_ocr_attempts
+        self.ocr_retry_interval = ocr_retry_interval
+        self.active = []
+        self.finished = deque(maxlen=max_finished)
+        self._events = []
+        self._ids = count(1)
+        self._frame_index = 0
+        self._matched = []
+
+    def update(self, candidates, frame_index):
+        self._frame_index = frame_index
+        pairs = []
+        for ti, track in enumerate(self.active):
+            for ci, candidate in enumerate(candidates):
+                iou = bbox_iou(track.bbox, candidate['bbox'])
+                if iou >= self.iou_threshold:
+                    pairs.append((1.0 + iou, ti, ci))
+                else:
+                    # 采样间隔内车辆移动较大时框可能不重叠，退化为质心距离匹配
+                    distance = _centroid_distance(track.bbox, candidate['bbox'])
+                    if distance < track.bbox[2] * 0.5:
+                        pairs.append((1.0 - distance / track.bbox[2], ti, ci))
+        pairs.sort(reverse=True)
+        used_tracks, used_candidates = set(), set()
+        self._matched = []
+        for _, ti, ci in pairs:
+            if ti in used_tracks or ci in used_candidates:
+                continue
+            used_tracks.add(ti)
+            used_candidates.add(ci)
+            track = self.active[ti]
+            track.bbox = candidates[ci]['bbox']
+            track.type = candidates[ci]['type']
+            track.score = candidates[ci].get('score', 0.0)
+            track.add_color(candidates[ci])
+            track.last_frame = frame_index
+            track.hits += 1
+            track.missed = 0
+            self._matched.append((track, candidates[ci]))
+        still_active = []
+        for ti, track in enumerate(self.active):
+            if ti not in used_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self._finish(track)
+                    continue
+            still_active.append(track)
+        self.active = still_active
+        for ci, candidate in enumerate(candidates):
+            if ci not in used_candidates:
+                track = Track(next(self._ids), candidate, frame_index)
+                self.active.append(track)
+                self._matched.append((track, candidate))
+        return [(track, candidate) for track, candidate in self._matched if self._needs_ocr(track)]
+
+    def _needs_ocr(self, track):
+        if not self._needs_more_readings(track):
+            return False
+        return (track.last_ocr_frame is None
+                or self._frame_index - track.last_ocr_frame >= self.ocr_retry_interval)
+
+    def add_reading(self, track, plate_text):
+        if plate_text == OCR_TIMEOUT:
+            # 进程池超时丢弃的候选区域没有被识别过，不占用识别次数，下一帧重试
+            track.ocr_timeouts += 1
+            return
+        track.ocr_attempts += 1
+        track.last_ocr_frame = self._frame_index
+        if is_valid_plate(plate_text):
+            track.readings.append(plate_text)
+            track.plate = vote_plate(track.readings)
+        if not self._needs_more_readings(track):
+            self._report(track)
+
+    def _needs_more_readings(self, track):
+        return len(track.readings) < self.ocr_per_track and track.ocr_attempts < self.max_ocr_attempts
+
+    def _report(self, track):
+        if track.plate and not track.reported:
+            track.reported = True
+            self._events.append(track.to_result())
+
+    def pop_events(self):
+        """取走自上次调用以来投票稳定或已结束的轨迹结果，每条轨迹只出现一次"""
+        events, self._events = self._events, []
+        return events
+
+    def observe(self, candidates, frame_index, ocr):
+        """关联本帧候选区域，对需要补充读数的轨迹整批 OCR，返回本帧结果。
+
+        ocr 为 PlateDetector 或 OCRBackend，传 PlateDetector 时 OCR 耗时计入其车道。
+        投票需要独立的读数，这里绕过 OCR 缓存。
+        """
+        to_ocr = self.update(candidates, frame_index)
+        if to_ocr:
+            texts = ocr.recognize_batch_uncached([c['crop'] for _, c in to_ocr])
+            for (track, _), plate_text in zip(to_ocr, texts):
+                self.add_reading(track, plate_text)
+        return self.frame_results()
+
+    def frame_results(self):
+        """本帧匹配到且已有车牌号的轨迹，格式与检测结果一致"""
+        return [track.to_result() for track, _ in self._matched if track.plate]
+
+    def _finish(self, track):
+        if track.plate:
+            self.finished.append(track)
+            self._report(track)
+
+    def finish_all(self):
+        """结束全部轨迹，取走并清空已结束轨迹的结果"""
+        for track in self.active:
+            self._finish(track)
+        self.active = []
+        results = [track.to_result() for track in self.finished]
+        self.finished.clear()
+        return results
@@ -0,0 +1,145 @@
+# space_allocator.py
+"""车位分配。
+
+内存中按车位类型（parking_spaces.space_type，没有该列或为空时视为通用车位）
+维护空闲车位集合，取候选车位是 O(1) 的集合操作，不随占用率变化扫描整张表。
+内存状态只用来挑候选：真正的占用通过 SELECT ... FOR UPDATE SKIP LOCKED 按主键
+锁定仍为 free 的车位后再更新，多个车道、多个进程同时分配也不会拿到同一个车位；
+内存与数据库不一致时候选会被跳过并在下次刷新时纠正。SKIP LOCKED 需要 MySQL 8.0 以上；
+SQLite 的写事务本身互斥（storage.SQLiteStorage 以 BEGIN IMMEDIATE 开始），不需要行锁子句。
+"""
+import time
+import logging
+import threading
+
+# 各车型依次尝试的车位类型，None 为未标注类型的通用车位
+SPACE_PREFERENCES = {
+    'small_car': ('small_car', None, 'large_car'),
+    'large_car': ('large_car', None)
+}
+REFRESH_INTERVAL = 60
+# MySQL 的行锁子句；SQLite 写事务本身互斥，传空串即可
+SKIP_LOCKED = " FOR UPDATE SKIP LOCKED"
+MAX_CLAIM_ROUNDS = 3
+
+
+def placeholders(count):
+    """count 个 %s 占位符，用于 IN (...) 列表"""
+    return ', '.join(['%s'] * count)
+
+
+class SpaceAllocator:
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, lock_clause=SKIP_LOCKED):
+        self.refresh_interval = refresh_interval
+        self.lock_clause = lock_clause
+        self._free = {}
+        self._space_type = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, cursor):
+        """从数据库重新加载全部车位状态"""
+        cursor.execute("SELECT * FROM parking_spaces")
+        free = {}
+        space_type = {}
+        for row in cursor.fetchall():
+            kind = row.get('space_type') or None
+            space_type[row['space_id']] = kind
+            if row.get('status') == 'free':
+                free.setdefault(kind, set()).add(row['space_id'])
+        with self._lock:
+            self._free = free
+            self._space_type = space_type
+            self._loaded_at = time.monotonic()
+        logging.info(f"车位状态已加载: 共 {len(space_type)} 个，空闲 {sum(len(s) for s in free.values())} 个")
+
+    def invalidate(self):
+        """事务回滚等情况下内存状态可能失真，下次分配前重新加载"""
+        with self._lock:
+            self._loaded_at = None
+
+    def free_count(self):
+        with self._lock:
+            return {kind: len(spaces) for kind, spaces in self._free.items()}
+
+    def _stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+
+    def _pick(self, vehicle_type):
+        for kind in SPACE_PREFERENCES.get(vehicle_type, (None,) + tuple(SPACE_PREFERENCES)):
+            spaces = self._free.get(kind)
+            if spaces:
+                return spaces.pop()
+        return None
+
+    def claim(self, cursor, vehicle_types):
+        """为每个车型各占用一个车位，返回与 vehicle_types 对应的 space_id 列表，无车位时为 None。
+
+        在调用方的事务中执行：锁定并更新车位状态，提交或回滚由调用方负责，
+        回滚后应调用 invalidate()。
+        """
+        if self._stale():
+            self.refresh(cursor)
+        claimed = [None] * len(vehicle_types)
+        pending = list(range(len(vehicle_types)))
+        reloaded = False
+        for _ in range(MAX_CLAIM_ROUNDS):
+            with self._lock:
+                picks = {i: self._pick(vehicle_types[i]) for i in pending}
+            candidates = [space_id for space_id in picks.values() if space_id is not None]
+            if candidates:
+                # 只锁仍为 free 且没被其他事务锁住的车位，被占用或失效的候选直接丢弃
+                cursor.execute(
+                    f"SELECT space_id FROM parking_spaces WHERE space_id IN ({placeholders(len(candidates))}) "
+                    f"AND status = 'free'{self.lock_clause}",
+                    candidates
+                )
+                locked = {row['space_id'] for row in cursor.fetchall()}
+            else:
+                locked = set()
+            pending = []
+            for i, space_id in picks.items():
+                if space_id in locked:
+                    claimed[i] = space_id
+                else:
+                    pending.append(i)
+            if not pending:
+                break
+            if all(picks[i] is None for i in pending):
+                # 内存中已无候选，数据库里可能有其他入口释放的车位，重新加载一次
+                if reloaded:
+                    break
+                self.refresh(cursor)
+                # 本次已锁定的车位在数据库中仍是 free，不能再次作为候选
+                with self._lock:
+                    for space_id in claimed:
+                        if space_id is not None:
+                            self._free.get(self._space_type.get(space_id), set()).discard(space_id)
+                reloaded = True
+        taken = [space_id for space_id in claimed if space_id is not None]
+        if taken:
+            cursor.execute(
+                f"UPDATE parking_spaces SET status = 'occupied' WHERE space_id IN ({placeholders(len(taken))})",
+                taken
+            )
+        return claimed
+
+    def release(self, space_ids):
+        """车位在数据库中改为 free 后调用，放回空闲集合"""
+        with self._lock:
+            for space_id in space_ids:
+                if space_id in self._space_type:
+                    self._free.setdefault(self._space_type[space_id], set()).add(space_id)
+
+
+_shared_allocator = None
+_shared_lock = threading.Lock()
+
+
+def get_space_allocator():
+    """进程内共享的车位分配器"""
+    global _shared_allocator
+    with _shared_lock:
+        if _shared_allocator is None:
+            _shared_allocator = SpaceAllocator()
+        return _shared_allocator
@@ -0,0 +1,159 @@
+# stage_timing.py
+import os
+import time
+import threading
+import logging
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LANE = 'default'
+
+
+class _NullStage:
+    """计时关闭时 stage() 返回的共享空上下文，不做任何事"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('timers', 'lane', 'name', 'started')
+
+    def __init__(self, timers, lane, name):
+        self.timers = timers
+        self.lane = lane
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timers.record(self.lane, self.name, time.perf_counter() - self.started)
+        return False
+
+
+class RollingHistogram:
+    """保留最近 window 个样本用于分位数，另外累计总次数和总耗时"""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        values = sorted(self.samples)
+        if not values:
+            return {'count': self.count, 'sum_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0}
+
+        def quantile(q):
+            return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3)
+
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total * 1000, 3),
+            'p50_ms': quantile(0.5),
+            'p95_ms': quantile(0.95),
+            'p99_ms': quantile(0.99)
+        }
+
+
+class StageTimers:
+    """按 (车道, 阶段) 统计耗时的滚动直方图。
+
+    用法: with stage_timers.stage('canny', lane): ...
+    关闭时 stage() 直接返回共享的空上下文，不读时钟、不加锁。
+    """
+
+    def __init__(self, enabled=False, window=1000):
+        self.enabled = enabled
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def stage(self, name, lane=DEFAULT_LANE):
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, lane, name)
+
+    def record(self, lane, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get((lane, name))
+            if histogram is None:
+                histogram = self._histograms[(lane, name)] = RollingHistogram(self.window)
+            histogram.add(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def snapshot(self):
+        """返回 {车道: {阶段: {count, sum_ms, p50_ms, p95_ms, p99_ms}}}"""
+        with self._lock:
+            items = [(key, histogram.summary()) for key, histogram in self._histograms.items()]
+        snapshot = {}
+        for (lane, name), summary in items:
+            snapshot.setdefault(lane, {})[name] = summary
+        return snapshot
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP plate_stage_seconds Per-stage processing time of the plate pipeline.",
+            "# TYPE plate_stage_seconds summary"
+        ]
+        for lane, stages in sorted(self.snapshot().items()):
+            for name, summary in sorted(stages.items()):
+                labels = f'lane="{lane}",stage="{name}"'
+                for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+                    lines.append(f'plate_stage_seconds{{{labels},quantile="{quantile}"}} {summary[key] / 1000:.6f}')
+                lines.append(f'plate_stage_seconds_sum{{{labels}}} {summary["sum_ms"] / 1000:.6f}')
+                lines.append(f'plate_stage_seconds_count{{{labels}}} {summary["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host='127.0.0.1'):
+        """在后台线程启动本地 HTTP 服务，GET /metrics 返回 Prometheus 文本格式"""
+        if self._server is not None:
+            return self._server
+        timers = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = timers.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="stage-metrics", daemon=True).start()
+        logging.info(f"阶段耗时指标: http://{host}:{port}/metrics")
+        return self._server
+
+
+# 进程内共享的计时器，设置环境变量 PLATE_STAGE_TIMING=1 时默认开启
+stage_timers = StageTimers(enabled=os.environ.get('PLATE_STAGE_TIMING') == '1')
@@ -0,0 +1,405 @@
+# storage.py
+"""停车数据存储：车牌、在场记录、车位和费用。
+
+MySQLStorage 使用共享连接池；SQLiteStorage 是嵌入式本地库（WAL 模式），
+用于不连数据库服务器的闸口机，以及本地测试和性能基准。两者共用
+parking_store 中的批量写入逻辑和 space_allocator 的车位分配，SQL 统一用 %s 占位符书写。
+
+schema 按版本号顺序迁移：MySQL 记录在 schema_version 表，SQLite 记录在 PRAGMA user_version。
+MySQL 的 DDL 会隐式提交，迁移中途失败时已执行的语句不会回滚、版本号也不会记录，
+因此 MySQL 迁移的每条语句都写成可重复执行的（IF NOT EXISTS、忽略重复列/索引、去重语句），
+修复问题后重新运行迁移即可从头补齐；SQLite 的 DDL 在事务内，失败时整体回滚。
+用法: python storage.py --migrate
+"""
+import sys
+import logging
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from db_pool import db_config
+from parking_store import record_gate_events, PLATE_UPSERT_SQL
+from space_allocator import SpaceAllocator
+
+# (版本, 说明, 语句列表)。第 1 版在已有库上是空操作，第 2 版给旧库补上热点查询需要的索引。
+# 旧库的 license_plates 可能有重复车牌，加唯一索引前先把记录指向最小的 plate_id 并删掉重复行
+MYSQL_MIGRATIONS = [
+    (1, "初始表结构", [
+        """CREATE TABLE IF NOT EXISTS license_plates (
+            plate_id INT AUTO_INCREMENT PRIMARY KEY,
+            plate_number VARCHAR(16) NOT NULL,
+            plate_color VARCHAR(16) NOT NULL DEFAULT 'blue',
+            UNIQUE KEY uk_plate_number (plate_number)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+        """CREATE TABLE IF NOT EXISTS parking_spaces (
+            space_id INT AUTO_INCREMENT PRIMARY KEY,
+            space_type VARCHAR(16) NULL,
+            status VARCHAR(16) NOT NULL DEFAULT 'free',
+            KEY idx_spaces_status (status, space_type)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+        """CREATE TABLE IF NOT EXISTS parking_records (
+            record_id INT AUTO_INCREMENT PRIMARY KEY,
+            plate_id INT NOT NULL,
+            space_id INT NULL,
+            entry_time DATETIME NOT NULL,
+            exit_time DATETIME NULL,
+            status VARCHAR(16) NOT NULL DEFAULT 'parking',
+            KEY idx_records_plate_status (plate_id, status),
+            KEY idx_records_space_status (space_id, status)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+        """CREATE TABLE IF NOT EXISTS parking_fees (
+            fee_id INT AUTO_INCREMENT PRIMARY KEY,
+            record_id INT NOT NULL,
+            total_amount DECIMAL(10, 2) NOT NULL,
+            payment_status VARCHAR(16) NOT NULL DEFAULT 'unpaid',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_fees_record (record_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"""
+    ]),
+    (2, "旧库补充车位类型和索引", [
+        "ALTER TABLE parking_spaces ADD COLUMN space_type VARCHAR(16) NULL",
+        """UPDATE parking_records pr
+            JOIN license_plates dup ON pr.plate_id = dup.plate_id
+            JOIN (SELECT plate_number, MIN(plate_id) AS keep_id FROM license_plates
+                  GROUP BY plate_number HAVING COUNT(*) > 1) keep
+              ON dup.plate_number = keep.plate_number AND dup.plate_id <> keep.keep_id
+            SET pr.plate_id = keep.keep_id""",
+        """DELETE dup FROM license_plates dup
+            JOIN license_plates keep ON dup.plate_number = keep.plate_number AND dup.plate_id > keep.plate_id""",
+        "ALTER TABLE license_plates ADD UNIQUE KEY uk_plate_number (plate_number)",
+        "ALTER TABLE parking_records ADD KEY idx_records_plate_status (plate_id, status)",
+        "ALTER TABLE parking_records ADD KEY idx_records_space_status (space_id, status)",
+        "ALTER TABLE parking_spaces ADD KEY idx_spaces_status (status, space_type)",
+        "ALTER TABLE parking_fees ADD KEY idx_fees_record (record_id)"
+    ])
+]
+# 重复列名 / 重复索引名：第 2 版在新建的库上会遇到，视为已完成
+MYSQL_IGNORED_ERRORS = (1060, 1061)
+
+SQLITE_MIGRATIONS = [
+    (1, "初始表结构", [
+        """CREATE TABLE license_plates (
+            plate_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plate_number TEXT NOT NULL UNIQUE,
+            plate_color TEXT NOT NULL DEFAULT 'blue'
+        )""",
+        """CREATE TABLE parking_spaces (
+            space_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            space_type TEXT,
+            status TEXT NOT NULL DEFAULT 'free'
+        )""",
+        "CREATE INDEX idx_spaces_status ON parking_spaces (status, space_type)",
+        """CREATE TABLE parking_records (
+            record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plate_id INTEGER NOT NULL REFERENCES license_plates (plate_id),
+            space_id INTEGER REFERENCES parking_spaces (space_id),
+            entry_time TIMESTAMP NOT NULL,
+            exit_time TIMESTAMP,
+            status TEXT NOT NULL DEFAULT 'parking'
+        )""",
+        "CREATE INDEX idx_records_plate_status ON parking_records (plate_id, status)",
+        "CREATE INDEX idx_records_space_status ON parking_records (space_id, status)",
+        """CREATE TABLE parking_fees (
+            fee_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL REFERENCES parking_records (record_id),
+            total_amount REAL NOT NULL,
+            payment_status TEXT NOT NULL DEFAULT 'unpaid',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "CREATE INDEX idx_fees_record ON parking_fees (record_id)"
+    ])
+]
+SQLITE_PLATE_UPSERT_SQL = (
+    "INSERT INTO license_plates (plate_number, plate_color) VALUES (%s, %s) "
+    "ON CONFLICT (plate_number) DO UPDATE SET plate_color = excluded.plate_color"
+)
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+
+class Storage:
+    """存储接口。子类提供 connection()、cursor() 和 schema 版本读写，
+    业务操作在这里用通用 SQL 实现。"""
+    migrations = []
+    upsert_sql = PLATE_UPSERT_SQL
+
+    def __init__(self, allocator):
+        self.allocator = allocator
+
+    def connection(self, write=True):
+        """上下文管理器，产出一个已开启事务的连接，出错时回滚；只读操作传 write=False"""
+        raise NotImplementedError
+
+    def cursor(self, conn):
+        """返回按列名取值（行为 dict）、使用 %s 占位符的游标"""
+        raise NotImplementedError
+
+    def schema_version(self, cursor):
+        raise NotImplementedError
+
+    def set_schema_version(self, cursor, version):
+        raise NotImplementedError
+
+    def apply_statement(self, cursor, sql):
+        cursor.execute(sql)
+
+    def latest_version(self):
+        return max((target for target, _, _ in self.migrations), default=0)
+
+    def check_schema(self):
+        """schema 低于最新迁移版本时拒绝使用。
+
+        旧库缺少 uk_plate_number 时车牌 upsert 会不断插入新行，在场记录查不到，
+        每次识别都会被当成新的进场、离场永远不计费，因此不能带着旧 schema 运行。
+        """
+        with self.connection() as conn:
+            cursor = self.cursor(conn)
+            version = self.schema_version(cursor)
+            conn.commit()
+            cursor.close()
+        latest = self.latest_version()
+        if version < latest:
+            raise RuntimeError(f"数据库 schema 为第 {version} 版，需要第 {latest} 版，"
+                               f"请先运行 python storage.py --migrate 或在 db_config.json 中设置 auto_migrate")
+        return version
+
+    def migrate(self):
+        """按版本号执行尚未应用的迁移，返回迁移后的版本"""
+        with self.connection() as conn:
+            cursor = self.cursor(conn)
+            version = self.schema_version(cursor)
+            for target, description, statements in self.migrations:
+                if target <= version:
+                    continue
+                for sql in statements:
+                    self.apply_statement(cursor, sql)
+                self.set_schema_version(cursor, target)
+                version = target
+                logging.info(f"数据库 schema 已迁移到第 {target} 版: {description}")
+            conn.commit()
+            cursor.close()
+        return version
+
+    def record_gate_events(self, events, rules):
+        """一个事务内批量处理识别事件，返回各车辆的处理结果"""
+        try:
+            with self.connection() as conn:
+                cursor = self.cursor(conn)
+                outcomes = record_gate_events(cursor, events, rules, self.allocator, self.upsert_sql)
+                conn.commit()
+                cursor.close()
+        except Exception:
+            # 事务已回滚，内存中的空闲车位可能与数据库不一致
+            self.allocator.invalidate()
+            raise
+        return outcomes
+
+    def parked_vehicles(self):
+        """当前在场的车辆: [{plate_number, plate_color, entry_time}]"""
+        with self.connection(write=False) as conn:
+            cursor = self.cursor(conn)
+            cursor.execute(
+                "SELECT lp.plate_number, lp.plate_color, pr.entry_time "
+                "FROM parking_records pr JOIN license_plates lp ON pr.plate_id = lp.plate_id "
+                "WHERE pr.status = 'parking'"
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows
+
+    def close_session(self, plate_number, exit_time, total_amount):
+        """手工结算某车牌的在场记录并写入费用，返回结束的记录，没有在场记录时返回 None"""
+        with self.connection() as conn:
+            cursor = self.cursor(conn)
+            cursor.execute(
+                "SELECT pr.record_id, pr.space_id FROM parking_records pr "
+                "JOIN license_plates lp ON pr.plate_id = lp.plate_id "
+                "WHERE lp.plate_number = %s AND pr.status = 'parking'",
+                (plate_number,)
+            )
+            record = cursor.fetchone()
+            if record:
+                cursor.execute(
+                    "UPDATE parking_records SET exit_time = %s, status = 'completed' WHERE record_id = %s",
+                    (exit_time, record['record_id'])
+                )
+                cursor.execute("UPDATE parking_spaces SET status = 'free' WHERE space_id = %s", (record['space_id'],))
+                cursor.execute(
+                    "INSERT INTO parking_fees (record_id, total_amount, payment_status) VALUES (%s, %s, %s)",
+                    (record['record_id'], total_amount, 'unpaid')
+                )
+                conn.commit()
+                self.allocator.release([record['space_id']])
+            cursor.close()
+        return record
+
+    def seed_spaces(self, spaces):
+        """车位表为空时按 {类型: 数量} 生成车位"""
+        with self.connection() as conn:
+            cursor = self.cursor(conn)
+            cursor.execute("SELECT COUNT(*) AS total FROM parking_spaces")
+            if cursor.fetchone()['total'] == 0:
+                rows = [(space_type, 'free') for space_type, count in spaces.items() for _ in range(count)]
+                if rows:
+                    cursor.executemany("INSERT INTO parking_spaces (space_type, status) VALUES (%s, %s)", rows)
+                    logging.info(f"已生成 {len(rows)} 个车位")
+            conn.commit()
+            cursor.close()
+        self.allocator.invalidate()
+
+
+class MySQLStorage(Storage):
+    migrations = MYSQL_MIGRATIONS
+
+    def __init__(self, allocator=None):
+        from db_pool import get_db_pool
+        from space_allocator import get_space_allocator
+        super().__init__(allocator if allocator is not None else get_space_allocator())
+        self.pool = get_db_pool()
+
+    def connection(self, write=True):
+        return self.pool.connection()
+
+    def cursor(self, conn):
+        return conn.cursor(dictionary=True)
+
+    def schema_version(self, cursor):
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+        cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+        row = cursor.fetchone()
+        return (row and row['version']) or 0
+
+    def set_schema_version(self, cursor, version):
+        cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (version,))
+
+    def apply_statement(self, cursor, sql):
+        from mysql.connector import errors
+        try:
+            cursor.execute(sql)
+        except errors.Error as e:
+            if e.errno not in MYSQL_IGNORED_ERRORS:
+                raise
+            logging.info(f"跳过已存在的列或索引: {e.msg}")
+
+
+class _SQLiteCursor:
+    """把 %s 占位符转换为 SQLite 的 ?，其余操作直接转交"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        return self._cursor.execute(sql.replace('%s', '?'), params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._cursor.executemany(sql.replace('%s', '?'), seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteStorage(Storage):
+    """嵌入式 SQLite 存储。每个线程各用一个连接，WAL 模式下读写互不阻塞；
+    写事务以 BEGIN IMMEDIATE 开始，同一时刻只有一个写者，车位分配因此不需要行锁；
+    只读事务用普通的 BEGIN，不占写锁，不会与入库线程互相等待。"""
+    migrations = SQLITE_MIGRATIONS
+    upsert_sql = SQLITE_PLATE_UPSERT_SQL
+
+    def __init__(self, path='parking.db', allocator=None, spaces=None):
+        super().__init__(allocator if allocator is not None else SpaceAllocator(lock_clause=''))
+        self.path = path
+        self._local = threading.local()
+        self.migrate()
+        if spaces:
+            self.seed_spaces(spaces)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+            conn.row_factory = _dict_row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def connection(self, write=True):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        finally:
+            # 未提交（出错或只读）的事务一律回滚
+            if conn.in_transaction:
+                conn.rollback()
+
+    def cursor(self, conn):
+        return _SQLiteCursor(conn.cursor())
+
+    def schema_version(self, cursor):
+        cursor.execute("PRAGMA user_version")
+        return cursor.fetchone()['user_version']
+
+    def set_schema_version(self, cursor, version):
+        cursor.execute(f"PRAGMA user_version = {int(version)}")
+
+
+def create_storage(config=None, check_schema=True):
+    """按 db_config 的 backend 创建存储。
+
+    MySQL 在 auto_migrate 时执行迁移，否则检查 schema 版本，低于最新版本时抛出 RuntimeError；
+    check_schema=False 只用于迁移命令本身。
+    """
+    config = config if config is not None else db_config
+    backend = config.get('backend', 'mysql')
+    if backend == 'sqlite':
+        return SQLiteStorage(config.get('sqlite_path', 'parking.db'), spaces=config.get('spaces'))
+    if backend == 'mysql':
+        storage = MySQLStorage()
+        if config.get('auto_migrate'):
+            storage.migrate()
+        elif check_schema:
+            storage.check_schema()
+        return storage
+    raise ValueError(f"未知的存储后端: {backend}")
+
+
+_default_storage = None
+_default_lock = threading.Lock()
+
+
+def get_storage():
+    """进程内共享的存储，首次使用时创建"""
+    global _default_storage
+    with _default_lock:
+        if _default_storage is None:
+            _default_storage = create_storage()
+        return _default_storage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="停车数据存储维护")
+    parser.add_argument('--migrate', action='store_true', help="执行尚未应用的 schema 迁移")
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], help="覆盖 db_config 中的 backend")
+    args = parser.parse_args(argv)
+    config = dict(db_config)
+    if args.backend:
+        config['backend'] = args.backend
+    storage = create_storage(config, check_schema=not args.migrate)
+    if args.migrate:
+        logging.info(f"当前 schema 版本: {storage.migrate()}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,251 @@
+# stream_manager.py
+import os
+import time
+import threading
+import logging
+from collections import deque
+from frame_source import FrameSource
+from frame_pipeline import FrameQueue
+from plate_detector import PlateDetector
+from plate_tracker import PlateTracker
+from motion_gate import MotionGate
+from adaptive_sampler import AdaptiveSampler
+from camera_config import load_camera_config
+from ocr_backend import PoolOCRBackend
+from plate_aggregator import PlateAggregator
+
+
+class Lane:
+    """一路视频源（一个出入口车道）及其独立的跟踪、运动门控和计数状态"""
+
+    def __init__(self, name, spec, priority=1, queue_size=4):
+        self.name = name
+        self.spec = spec
+        self.source = FrameSource.from_spec(spec)
+        self.priority = max(1, priority)
+        self.camera = load_camera_config(self.source.source)
+        # 文件源靠背压控制速度，实时源丢弃最旧的帧
+        self.queue = FrameQueue(queue_size, drop_oldest=self.source.is_live)
+        self.tracker = PlateTracker()
+        self.gate = MotionGate(gate_region=self.camera.get('gate_region'))
+        self.sampler = None
+        self.aggregator = PlateAggregator()
+        self.status = 'starting'
+        self.error = None
+        self.decoded = 0
+        self.processed = 0
+        self.detections = 0
+        self.last_frame_at = None
+        self.busy = False
+        self.done = False
+        self.pass_value = 0.0
+        self._done_times = deque()
+
+    def record_done(self, now):
+        self.processed += 1
+        self.last_frame_at = now
+        self._done_times.append(now)
+        while self._done_times and now - self._done_times[0] > 1.0:
+            self._done_times.popleft()
+
+    def stats(self):
+        return {
+            'source': str(self.spec),
+            'priority': self.priority,
+            'status': self.status,
+            'error': self.error,
+            'decoded': self.decoded,
+            'processed': self.processed,
+            'dropped': self.queue.dropped,
+            'detections': self.detections,
+            'plates': len(self.aggregator),
+            'fps': float(len(self._done_times)),
+            'lag': self.sampler.lag if self.sampler else 0.0,
+            'interval': self.sampler.interval() if self.sampler else 0
+        }
+
+
+class StreamManager:
+    """多路视频源共用一个检测/OCR 工作线程池。
+
+    每路一个解码线程把采样帧放进各自的有界队列；工作线程按步长调度
+    （priority 越大分到的份额越多）在各路之间公平取帧。同一路同一时刻只由一个
+    工作线程处理，因此每路的帧顺序、跟踪和运动门控状态都是串行的。
+    on_result(车道名, 帧序号, 帧, 结果)、on_events(车道名, 投票稳定或已结束的轨迹结果)、
+    on_lane_finished(车道名, 车牌汇总列表) 和 on_lane_error(车道名, 错误信息) 在工作线程中回调；
+    出错的车道停止解码并标记为 error。
+
+    不传 ocr 时建立一个 ocr_workers 个进程的 PoolOCRBackend（默认与工作线程数相同），
+    各车道的 OCR 并行执行；传入进程内后端（如 TesserocrBackend）时各车道的识别会被其锁串行化。
+    """
+
+    def __init__(self, workers=None, ocr=None, ocr_workers=None, ocr_timeout=None, queue_size=4,
+                 stall_timeout=5.0, on_result=None, on_events=None, on_lane_finished=None, on_lane_error=None):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self._owns_ocr = ocr is None
+        self.ocr = ocr if ocr is not None else PoolOCRBackend(workers=ocr_workers or self.workers,
+                                                              frame_timeout=ocr_timeout)
+        self.queue_size = queue_size
+        self.stall_timeout = stall_timeout
+        self.on_result = on_result
+        self.on_events = on_events
+        self.on_lane_finished = on_lane_finished
+        self.on_lane_error = on_lane_error
+        self.lanes = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+
+    def add_lane(self, name, spec, priority=1):
+        with self._cond:
+            lane = Lane(name, spec, priority=priority, queue_size=self.queue_size)
+            # 新加入的车道从当前最小步长值开始，避免一次性抢占大量份额
+            lane.pass_value = min((l.pass_value for l in self.lanes.values()), default=0.0)
+            self.lanes[name] = lane
+        if self._running:
+            self._start_decoder(lane)
+        return lane
+
+    def start(self):
+        self._running = True
+        for lane in list(self.lanes.values()):
+            self._start_decoder(lane)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work_loop, name=f"lane-worker-{i}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            for lane in self.lanes.values():
+                lane.queue.close(discard=True)
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._owns_ocr:
+            self.ocr.close()
+
+    def stats(self):
+        """各车道的健康状态和吞吐计数"""
+        now = time.monotonic()
+        with self._cond:
+            for lane in self.lanes.values():
+                if (lane.status == 'running' and lane.last_frame_at is not None
+                        and now - lane.last_frame_at > self.stall_timeout):
+                    lane.status = 'stalled'
+            return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def _start_decoder(self, lane):
+        thread = threading.Thread(target=self._decode_loop, args=(lane,), name=f"lane-decoder-{lane.name}",
+                                  daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _decode_loop(self, lane):
+        try:
+            if not lane.source.open():
+                self._fail_lane(lane, f"无法打开视频: {lane.spec}")
+                return
+            lane.sampler = AdaptiveSampler(lane.source.fps)
+            lane.aggregator.fps = lane.source.fps
+            interval = lane.sampler.interval if lane.source.is_live else max(1, int(lane.source.fps / 10))
+            lane.status = 'running'
+            lane.last_frame_at = time.monotonic()
+            for frame_index, frame in lane.source.sampled_frames(interval, lambda: self._running):
+                lane.decoded += 1
+                lane.sampler.frame_decoded(frame_index)
+                if not lane.queue.put((frame_index, frame)):
+                    break
+                with self._cond:
+                    self._cond.notify()
+        except Exception as e:
+            self._fail_lane(lane, f"解码错误: {e}")
+        finally:
+            lane.source.release()
+            lane.queue.close()
+            with self._cond:
+                self._cond.notify_all()
+
+    def _next_job(self):
+        """选出有待处理帧、当前空闲且步长值最小的车道"""
+        with self._cond:
+            while self._running:
+                ready = [lane for lane in self.lanes.values() if not lane.busy and len(lane.queue)]
+                finished = [lane for lane in self.lanes.values()
+                            if not lane.busy and not lane.done and lane.queue.exhausted]
+                if finished:
+                    lane = finished[0]
+                    lane.done = True
+                    if lane.status != 'error':
+                        lane.status = 'finished'
+                    lane.busy = True
+                    return lane, None
+                if ready:
+                    lane = min(ready, key=lambda l: l.pass_value)
+                    lane.busy = True
+                    lane.pass_value += 1.0 / lane.priority
+                    return lane, lane.queue.get_nowait()
+                self._cond.wait(0.5)
+        return None, None
+
+    def _release(self, lane):
+        with self._cond:
+            lane.busy = False
+            self._cond.notify_all()
+
+    def _work_loop(self):
+        # 检测器持有工作缓冲区，按 (工作线程, 车道) 各建一个
+        detectors = {}
+        while True:
+            lane, item = self._next_job()
+            if lane is None:
+                break
+            try:
+                if item is None:
+                    self._finish_lane(lane)
+                    continue
+                detector = detectors.get(lane.name)
+                if detector is None:
+                    detector = detectors[lane.name] = PlateDetector(
+                        ocr=self.ocr, camera=lane.camera, lane=lane.name)
+                self._process(lane, detector, *item)
+            except Exception as e:
+                self._fail_lane(lane, f"处理错误: {e}")
+            finally:
+                self._release(lane)
+
+    def _process(self, lane, detector, frame_index, frame):
+        candidates = detector.locate(frame) if lane.gate.should_detect(frame) else []
+        results = lane.tracker.observe(candidates, frame_index, detector)
+        lane.sampler.set_active(lane.gate.active or any(t.plate for t in lane.tracker.active))
+        lane.sampler.frame_done(frame_index)
+        lane.detections += len(results)
+        lane.aggregator.update(results, frame_index)
+        lane.record_done(time.monotonic())
+        if lane.status == 'stalled':
+            lane.status = 'running'
+        if self.on_result:
+            self.on_result(lane.name, frame_index, frame, results)
+        self._emit_events(lane)
+
+    def _fail_lane(self, lane, message):
+        """标记车道出错并停止其解码，剩余的帧丢弃，车道随后按结束处理"""
+        logging.error(f"车道 {lane.name} {message}")
+        lane.status = 'error'
+        lane.error = message
+        lane.queue.close(discard=True)
+        if self.on_lane_error:
+            self.on_lane_error(lane.name, message)
+
+    def _emit_events(self, lane):
+        events = lane.tracker.pop_events()
+        if events and self.on_events:
+            self.on_events(lane.name, events)
+
+    def _finish_lane(self, lane):
+        lane.tracker.finish_all()
+        self._emit_events(lane)
+        if self.on_lane_finished:
+            self.on_lane_finished(lane.name, lane.aggregator.snapshot())
@@ -0,0 +1,15 @@
+# conftest.py
+import os
+import sys
+import pytest
+
+# 模块都在仓库根目录，直接 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import SQLiteStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """临时目录中的 SQLite 存储：两个小车位、一个大车位"""
+    return SQLiteStorage(str(tmp_path / 'parking.db'), spaces={'small_car': 2, 'large_car': 1})
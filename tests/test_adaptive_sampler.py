@@ -0,0 +1,75 @@
+# test_adaptive_sampler.py
+import pytest
+import adaptive_sampler
+from adaptive_sampler import AdaptiveSampler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(adaptive_sampler.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def process(sampler, clock, frame_index, lag):
+    sampler.frame_decoded(frame_index)
+    clock[0] += lag
+    sampler.frame_done(frame_index)
+
+
+def test_intervals_from_fps():
+    sampler = AdaptiveSampler(25.0, target_fps=10)
+    assert sampler.interval() == 2
+    assert sampler.active_interval == 1
+    assert sampler.max_interval == 50
+    assert AdaptiveSampler(0, target_fps=5).interval() == 5
+
+
+def test_high_lag_widens_interval_up_to_max(clock):
+    sampler = AdaptiveSampler(25.0, target_fps=10, target_lag=0.5, max_interval=10, smoothing=1.0)
+    intervals = []
+    for i in range(5):
+        process(sampler, clock, i, 1.0)
+        intervals.append(sampler.interval())
+    assert intervals == [3, 5, 8, 10, 10]
+
+
+def test_low_lag_recovers_to_floor(clock):
+    sampler = AdaptiveSampler(25.0, target_fps=10, target_lag=0.5, smoothing=1.0)
+    for i in range(3):
+        process(sampler, clock, i, 1.0)
+    assert sampler.interval() == 8
+    for i in range(3, 20):
+        process(sampler, clock, i, 0.0)
+    assert sampler.interval() == sampler.base_interval
+    # 有运动时允许降到 active_interval
+    sampler.set_active(True)
+    process(sampler, clock, 20, 0.0)
+    assert sampler.interval() == sampler.active_interval
+
+
+def test_lag_within_band_keeps_interval(clock):
+    sampler = AdaptiveSampler(25.0, target_fps=5, target_lag=0.5, smoothing=1.0)
+    process(sampler, clock, 0, 0.5)
+    assert sampler.interval() == 5
+    assert sampler.lag == pytest.approx(0.5)
+
+
+def test_dropped_frames_are_forgotten(clock):
+    sampler = AdaptiveSampler(25.0, smoothing=1.0)
+    for i in range(3):
+        sampler.frame_decoded(i)
+    clock[0] += 0.1
+    sampler.frame_done(2)
+    assert sampler.lag == pytest.approx(0.1)
+    # 更早的帧已被清理，再报告完成不影响估计
+    sampler.frame_done(0)
+    assert sampler.lag == pytest.approx(0.1)
+    assert sampler.effective_fps == 1.0
+
+
+def test_effective_fps_counts_last_second(clock):
+    sampler = AdaptiveSampler(25.0)
+    for i in range(10):
+        process(sampler, clock, i, 0.25)
+    assert sampler.effective_fps == 5.0
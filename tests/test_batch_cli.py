@@ -0,0 +1,42 @@
+# test_batch_cli.py
+import os
+import pytest
+
+pytest.importorskip('cv2')
+from batch_cli import collect_files
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ('b.jpg', 'a.PNG', 'notes.txt', 'clip.mp4', 'sub/c.jpeg', 'sub/deep/d.avi'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+    return tmp_path
+
+
+def names(files, root):
+    return [os.path.relpath(path, root).replace(os.sep, '/') for path in files]
+
+
+def test_directory_is_sorted_and_filtered(tree):
+    assert names(collect_files([str(tree)]), tree) == ['a.PNG', 'b.jpg', 'clip.mp4']
+
+
+def test_recursive_directory(tree):
+    assert names(collect_files([str(tree)], recursive=True), tree) == [
+        'a.PNG', 'b.jpg', 'clip.mp4', 'sub/c.jpeg', 'sub/deep/d.avi']
+
+
+def test_glob_pattern(tree):
+    assert names(collect_files([str(tree / '*.jpg'), str(tree / '**' / '*.avi')], recursive=True), tree) == [
+        'b.jpg', 'sub/deep/d.avi']
+
+
+def test_duplicates_keep_first_position(tree):
+    files = collect_files([str(tree / 'clip.mp4'), str(tree), str(tree / 'b.jpg')])
+    assert names(files, tree) == ['clip.mp4', 'a.PNG', 'b.jpg']
+
+
+def test_missing_and_unsupported_inputs_are_dropped(tree):
+    assert collect_files([str(tree / 'missing.jpg'), str(tree / 'notes.txt')]) == []
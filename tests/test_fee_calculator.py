@@ -0,0 +1,26 @@
+# test_fee_calculator.py
+from datetime import datetime, timedelta
+import pytest
+from fee_calculator import DEFAULT_BILLING_RULES, calculate_fee
+
+ENTRY = datetime(2024, 1, 1, 8, 0)
+
+
+@pytest.mark.parametrize('plate_color, fee', [('blue', 9.0), ('green', 8.1), ('yellow', 18.0)])
+def test_fee_by_plate_color(plate_color, fee):
+    assert calculate_fee(ENTRY, ENTRY + timedelta(hours=3), plate_color, DEFAULT_BILLING_RULES) == pytest.approx(fee)
+
+
+def test_partial_hour_rounds_up():
+    assert calculate_fee(ENTRY, ENTRY + timedelta(minutes=61), 'blue', DEFAULT_BILLING_RULES) == pytest.approx(7.0)
+    assert calculate_fee(ENTRY, ENTRY + timedelta(minutes=5), 'blue', DEFAULT_BILLING_RULES) == pytest.approx(5.0)
+
+
+def test_color_without_rule_uses_blue_rule():
+    rules = [rule for rule in DEFAULT_BILLING_RULES if rule['plate_color'] != 'yellow']
+    assert calculate_fee(ENTRY, ENTRY + timedelta(hours=3), 'yellow', rules) == pytest.approx(9.0)
+
+
+def test_time_range_mismatch_is_free():
+    rules = [dict(DEFAULT_BILLING_RULES[0], time_range='20:00-06:00')]
+    assert calculate_fee(ENTRY, ENTRY + timedelta(hours=3), 'blue', rules) == 0.0
@@ -0,0 +1,94 @@
+# test_frame_pipeline.py
+import random
+import threading
+import time
+import pytest
+from frame_pipeline import END, FramePipeline, FrameQueue
+
+
+def run(pipeline):
+    pipeline.start()
+    try:
+        return list(pipeline.results())
+    finally:
+        pipeline.join(timeout=5)
+
+
+def slow_worker():
+    def worker(frame):
+        # 打乱各检测线程的完成顺序
+        time.sleep(random.uniform(0, 0.005))
+        return [frame * 10]
+    return worker
+
+
+def test_results_keep_decode_order():
+    frames = [(i, i) for i in range(50)]
+    out = run(FramePipeline(iter(frames), slow_worker, workers=4, queue_size=3))
+    assert [index for index, _, _ in out] == list(range(50))
+    assert all(results == [frame * 10] for _, frame, results in out)
+
+
+def test_gate_skips_detection():
+    class EvenGate:
+        def should_detect(self, frame):
+            return frame % 2 == 0
+
+    calls = []
+
+    def factory():
+        def worker(frame):
+            calls.append(frame)
+            return ['hit']
+        return worker
+
+    out = run(FramePipeline(iter([(i, i) for i in range(6)]), factory, workers=2, gate=EvenGate()))
+    assert [results for _, _, results in out] == [['hit'], [], ['hit'], [], ['hit'], []]
+    assert sorted(calls) == [0, 2, 4]
+
+
+def test_worker_error_is_raised_from_results():
+    def factory():
+        def worker(frame):
+            if frame == 3:
+                raise ValueError('boom')
+            return []
+        return worker
+
+    pipeline = FramePipeline(iter([(i, i) for i in range(20)]), factory, workers=2)
+    with pytest.raises(ValueError, match='boom'):
+        run(pipeline)
+
+
+def test_decoder_error_is_raised_from_results():
+    def frames():
+        yield 0, 0
+        raise IOError('decode failed')
+
+    pipeline = FramePipeline(frames(), lambda: (lambda frame: []), workers=2)
+    with pytest.raises(IOError, match='decode failed'):
+        run(pipeline)
+
+
+def test_queue_drop_oldest():
+    queue = FrameQueue(2, drop_oldest=True)
+    for i in range(4):
+        assert queue.put(i)
+    assert queue.dropped == 2
+    queue.close()
+    assert [queue.get(), queue.get(), queue.get()] == [2, 3, END]
+    assert queue.exhausted
+
+
+def test_queue_blocks_producer_until_consumed():
+    queue = FrameQueue(1)
+    queue.put('a')
+    done = threading.Event()
+    producer = threading.Thread(target=lambda: (queue.put('b'), done.set()))
+    producer.start()
+    assert not done.wait(0.05)
+    assert queue.get() == 'a'
+    assert done.wait(1)
+    producer.join()
+    assert queue.get_nowait() == 'b'
+    assert queue.get_nowait() is None
@@ -0,0 +1,72 @@
+# test_frame_source.py
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+from frame_source import FrameSource, SEEK_MIN_INTERVAL
+
+FRAMES = 60
+STEP = 4
+
+
+@pytest.fixture
+def video(tmp_path):
+    """第 i 帧整幅亮度为 i * STEP 的测试视频，用亮度反推帧号"""
+    path = str(tmp_path / 'frames.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25.0, (64, 48))
+    if not writer.isOpened():
+        pytest.skip('MJPG 编码器不可用')
+    for i in range(FRAMES):
+        writer.write(np.full((48, 64, 3), i * STEP, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def decoded_index(frame):
+    return int(round(float(frame.mean()) / STEP))
+
+
+def sample(source, interval, limit=None):
+    assert source.open()
+    try:
+        out = []
+        for frame_index, frame in source.sampled_frames(interval):
+            out.append((frame_index, decoded_index(frame)))
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+    finally:
+        source.release()
+
+
+def test_from_spec():
+    assert FrameSource.from_spec('0').source == 0
+    looped = FrameSource.from_spec('loop:clip.mp4')
+    assert looped.source == 'clip.mp4' and looped.loop and looped.realtime
+    assert FrameSource.from_spec('rtsp://cam/1').is_live
+
+
+def test_grab_sampling_returns_matching_frames(video):
+    out = sample(FrameSource(video), 7)
+    assert [index for index, _ in out] == list(range(0, FRAMES, 7))
+    assert all(index == decoded for index, decoded in out)
+
+
+def test_seek_sampling_returns_matching_frames(video):
+    out = sample(FrameSource(video), SEEK_MIN_INTERVAL)
+    assert [index for index, _ in out] == list(range(0, FRAMES, SEEK_MIN_INTERVAL))
+    assert all(index == decoded for index, decoded in out)
+
+
+def test_dynamic_interval(video):
+    intervals = iter([1, 2, 3, 4])
+    out = sample(FrameSource(video), lambda: next(intervals, 50), limit=5)
+    assert [index for index, _ in out] == [0, 1, 3, 6, 10]
+    assert all(index == decoded for index, decoded in out)
+
+
+def test_loop_keeps_index_increasing(video):
+    out = sample(FrameSource(video, loop=True), 25, limit=5)
+    assert [index for index, _ in out] == [0, 25, 50, 75, 100]
+    # 越过文件末尾后从第 0 帧重新开始
+    assert [decoded for _, decoded in out] == [0, 25, 50, 0, 25]
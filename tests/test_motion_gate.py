@@ -0,0 +1,51 @@
+# test_motion_gate.py
+import pytest
+
+pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+from motion_gate import MotionGate
+
+
+def blank(width=320, height=240):
+    return np.full((height, width, 3), 50, dtype=np.uint8)
+
+
+def with_box(x0, y0, x1, y1):
+    frame = blank()
+    frame[y0:y1, x0:x1] = 255
+    return frame
+
+
+def settle(gate):
+    """首帧总是放行，随后静止画面在 hold_frames 帧后被跳过"""
+    results = [gate.should_detect(blank()) for _ in range(gate.hold_frames + 2)]
+    assert results == [True] * (gate.hold_frames + 1) + [False]
+
+
+def test_static_scene_is_skipped_after_hold():
+    gate = MotionGate(hold_frames=3)
+    settle(gate)
+    assert gate.checked == 5 and gate.skipped == 1
+    assert not gate.active
+
+
+def test_change_triggers_and_holds():
+    gate = MotionGate(hold_frames=2)
+    settle(gate)
+    assert gate.should_detect(with_box(100, 80, 200, 160))
+    # 变化消失后继续放行 hold_frames 帧
+    assert [gate.should_detect(blank()) for _ in range(3)] == [True, True, False]
+
+
+def test_change_outside_gate_region_is_ignored():
+    gate = MotionGate(gate_region=(0.0, 0.0, 0.5, 1.0), hold_frames=0)
+    settle(gate)
+    assert not gate.should_detect(with_box(220, 80, 300, 160))
+    assert gate.should_detect(with_box(20, 80, 100, 160))
+
+
+def test_frame_size_change_resets_background():
+    gate = MotionGate(hold_frames=0)
+    settle(gate)
+    assert gate.should_detect(blank(640, 480))
+    assert not gate.should_detect(blank(640, 480))
@@ -0,0 +1,47 @@
+# test_ocr_cache.py
+import pytest
+
+pytest.importorskip('cv2')
+import ocr_cache
+from ocr_cache import OCRCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ocr_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_exact_and_near_match(clock):
+    cache = OCRCache(max_distance=2)
+    cache.put(0b1010, 'AB12345')
+    assert cache.get(0b1010) == 'AB12345'
+    assert cache.get(0b1011) == 'AB12345'
+    assert cache.get(0b0101) is None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_lru_eviction(clock):
+    cache = OCRCache(max_size=2, max_distance=0)
+    cache.put(1, 'AB11111')
+    cache.put(2, 'AB22222')
+    assert cache.get(1) == 'AB11111'
+    cache.put(3, 'AB33333')
+    assert cache.get(2) is None
+    assert cache.get(1) == 'AB11111'
+    assert cache.get(3) == 'AB33333'
+
+
+def test_ttl_expires_recently_used_old_entries(clock):
+    cache = OCRCache(max_distance=0, ttl=30.0)
+    cache.put(1, 'AB11111')
+    clock[0] += 20
+    cache.put(2, 'AB22222')
+    # 命中让旧条目排到最近使用的一端，过期判断仍应按写入时间
+    assert cache.get(1) == 'AB11111'
+    clock[0] += 15
+    assert cache.get(2) == 'AB22222'
+    assert cache.stats()['size'] == 1
+    assert cache.get(1) is None
@@ -0,0 +1,66 @@
+# test_parking_store.py
+from datetime import datetime, timedelta
+import pytest
+from fee_calculator import DEFAULT_BILLING_RULES
+from parking_store import MIN_DWELL
+
+ENTRY = datetime(2024, 1, 1, 8, 0)
+
+
+def event(plate, seen_at, vehicle_type='small_car', plate_color='blue'):
+    return {'plate': plate, 'type': vehicle_type, 'plate_color': plate_color,
+            'seen_at': seen_at, 'bbox': (0, 0, 0, 0)}
+
+
+def record(storage, events):
+    return storage.record_gate_events(events, DEFAULT_BILLING_RULES)
+
+
+def test_entry_then_exit(storage):
+    entry, = record(storage, [event('AB12345', ENTRY)])
+    assert entry['direction'] == 'entry'
+    assert entry['space_id'] is not None
+    exit_, = record(storage, [event('AB12345', ENTRY + timedelta(hours=2, minutes=30))])
+    assert exit_['direction'] == 'exit'
+    assert exit_['record_id'] == entry['record_id']
+    assert exit_['fee'] == pytest.approx(9.0)
+    assert storage.parked_vehicles() == []
+
+
+def test_same_batch_counts_once(storage):
+    outcomes = record(storage, [event('AB12345', ENTRY), event('AB12345', ENTRY + timedelta(seconds=1))])
+    assert [o['direction'] for o in outcomes] == ['entry']
+
+
+def test_same_plate_split_across_batches_is_not_an_exit(storage):
+    first, = record(storage, [event('AB12345', ENTRY)])
+    second, = record(storage, [event('AB12345', ENTRY + timedelta(seconds=1))])
+    third, = record(storage, [event('AB12345', ENTRY + MIN_DWELL / 2)])
+    assert first['direction'] == 'entry'
+    assert second['direction'] == 'duplicate'
+    assert third['direction'] == 'duplicate'
+    assert second['record_id'] == first['record_id']
+    assert len(storage.parked_vehicles()) == 1
+
+
+def test_reading_right_after_exit_is_not_a_new_entry(storage):
+    record(storage, [event('AB12345', ENTRY)])
+    exit_at = ENTRY + timedelta(hours=1)
+    exit_, = record(storage, [event('AB12345', exit_at)])
+    again, = record(storage, [event('AB12345', exit_at + timedelta(seconds=5))])
+    assert exit_['direction'] == 'exit'
+    assert again['direction'] == 'duplicate'
+    assert storage.parked_vehicles() == []
+    later, = record(storage, [event('AB12345', exit_at + MIN_DWELL)])
+    assert later['direction'] == 'entry'
+
+
+def test_rejected_when_full(storage):
+    outcomes = record(storage, [event(f'AB1234{i}', ENTRY, 'large_car') for i in range(2)])
+    assert sorted(o['direction'] for o in outcomes) == ['entry', 'rejected']
+
+
+def test_green_plate_discount(storage):
+    record(storage, [event('AD12345', ENTRY, plate_color='green')])
+    exit_, = record(storage, [event('AD12345', ENTRY + timedelta(hours=2, minutes=30), plate_color='green')])
+    assert exit_['fee'] == pytest.approx(8.1)
@@ -0,0 +1,61 @@
+# test_plate_aggregator.py
+from plate_aggregator import PlateAggregator, normalize_plate
+
+
+def result(plate, track_id=None, bbox=(0, 0, 100, 30), score=None):
+    r = {'plate': plate, 'type': 'small_car', 'bbox': bbox, 'plate_color': 'blue'}
+    if track_id is not None:
+        r['track_id'] = track_id
+    if score is not None:
+        r['score'] = score
+    return r
+
+
+def test_normalize_plate():
+    assert normalize_plate('ab 12.345') == 'AB12345'
+
+
+def test_intermediate_votes_do_not_become_plates():
+    aggregator = PlateAggregator(fps=10)
+    aggregator.update([result('AB1234S', track_id=1)], 0)
+    aggregator.update([result('AB12345', track_id=1)], 1)
+    aggregator.update([result('AB12345', track_id=1)], 2)
+    snapshot = aggregator.snapshot()
+    assert len(aggregator) == 1
+    assert [r['plate'] for r in snapshot] == ['AB12345']
+    assert snapshot[0]['hits'] == 3
+    assert snapshot[0]['first_time'] == 0.0
+    assert aggregator.get('AB1234S') is None
+
+
+def test_tracks_with_same_final_plate_merge():
+    aggregator = PlateAggregator()
+    aggregator.update([result('AB12345', track_id=1, score=0.5)], 0)
+    aggregator.update([result('AB12345', track_id=2, bbox=(10, 10, 100, 30), score=0.9)], 8)
+    aggregator.update([result('CD67890', track_id=3)], 9)
+    merged = aggregator.get('ab12345')
+    assert merged['hits'] == 2
+    assert merged['track_ids'] == [1, 2]
+    assert (merged['first_frame'], merged['last_frame']) == (0, 8)
+    assert merged['bbox'] == (10, 10, 100, 30)
+    assert [r['plate'] for r in aggregator.snapshot()] == ['AB12345', 'CD67890']
+
+
+def test_untracked_results_keyed_by_plate():
+    aggregator = PlateAggregator()
+    aggregator.update([result('AB12345'), result('')], 0)
+    aggregator.update([result('AB 12345')], 1)
+    assert len(aggregator) == 1
+    assert aggregator.get('AB12345')['track_ids'] == []
+
+
+def test_revote_moves_track_between_plates():
+    aggregator = PlateAggregator()
+    aggregator.update([result('AB12345', track_id=1), result('AB12345', track_id=2)], 0)
+    aggregator.update([result('AB12346', track_id=2)], 1)
+    assert aggregator.get('AB12345')['track_ids'] == [1]
+    assert aggregator.get('AB12346')['track_ids'] == [2]
+    aggregator.update([result('AB12345', track_id=2)], 2)
+    assert aggregator.get('AB12346') is None
+    assert aggregator.get('AB12345')['track_ids'] == [1, 2]
+    assert len(aggregator) == 1
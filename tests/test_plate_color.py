@@ -0,0 +1,29 @@
+# test_plate_color.py
+import pytest
+
+pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+from plate_detector import classify_plate_color, DEFAULT_PLATE_COLOR
+
+
+def plate(bgr, text=(255, 255, 255)):
+    """底色为 bgr、中间有一条白色"字符"的车牌区域"""
+    region = np.empty((40, 126, 3), dtype=np.uint8)
+    region[:] = bgr
+    region[15:25, 20:100] = text
+    return region
+
+
+@pytest.mark.parametrize('bgr, color', [
+    ((200, 80, 0), 'blue'),
+    ((60, 200, 40), 'green'),
+    ((0, 200, 230), 'yellow')
+])
+def test_classify_plate_color(bgr, color):
+    assert classify_plate_color(plate(bgr)) == color
+
+
+def test_unsaturated_region_defaults():
+    assert classify_plate_color(plate((128, 128, 128))) == DEFAULT_PLATE_COLOR
+    assert classify_plate_color(np.empty((0, 0, 3), dtype=np.uint8)) == DEFAULT_PLATE_COLOR
+    assert classify_plate_color(None) == DEFAULT_PLATE_COLOR
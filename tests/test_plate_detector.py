@@ -0,0 +1,32 @@
+# test_plate_detector.py
+import pytest
+
+pytest.importorskip('cv2')
+from plate_detector import bbox_iou, non_max_suppression, is_valid_plate
+
+
+def test_bbox_iou():
+    assert bbox_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert bbox_iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    assert bbox_iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+    assert bbox_iou((0, 0, 0, 0), (0, 0, 0, 0)) == 0.0
+
+
+def test_non_max_suppression_keeps_best_of_overlapping():
+    boxes = [(0.5, (0, 0, 100, 30)), (0.9, (5, 0, 100, 30)), (0.7, (300, 0, 100, 30))]
+    kept = non_max_suppression(boxes, 0.3)
+    assert kept == [(0.9, (5, 0, 100, 30)), (0.7, (300, 0, 100, 30))]
+
+
+def test_non_max_suppression_threshold():
+    # IoU 为 1/3
+    boxes = [(0.9, (0, 0, 100, 30)), (0.8, (50, 0, 100, 30))]
+    assert len(non_max_suppression(boxes, 0.4)) == 2
+    assert len(non_max_suppression(boxes, 0.3)) == 1
+
+
+def test_is_valid_plate():
+    assert is_valid_plate('AB12345')
+    assert not is_valid_plate('ABCDEFG')
+    assert not is_valid_plate('1234567')
+    assert not is_valid_plate('AB123')
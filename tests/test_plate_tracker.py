@@ -0,0 +1,71 @@
+# test_plate_tracker.py
+import pytest
+
+pytest.importorskip('cv2')
+from ocr_backend import OCR_TIMEOUT
+from plate_tracker import PlateTracker, vote_plate
+
+
+class ScriptedOCR:
+    """按顺序返回预先给定的识别结果，记录识别次数"""
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = 0
+
+    def recognize_batch_uncached(self, plate_imgs):
+        self.calls += len(plate_imgs)
+        return [self.texts.pop(0) for _ in plate_imgs]
+
+
+def candidate(x=100, y=100, w=120, h=40):
+    return {'bbox': (x, y, w, h), 'type': 'small_car', 'score': 0.9, 'plate_color': 'blue', 'crop': None}
+
+
+def test_vote_plate_per_character():
+    assert vote_plate(['AB12345', 'A812345', 'AB1234S']) == 'AB12345'
+    assert vote_plate(['AB12345', 'AB1234', 'AB12345']) == 'AB12345'
+    assert vote_plate([]) == ''
+
+
+def test_track_reads_a_few_times_then_stops():
+    tracker = PlateTracker(ocr_per_track=3, ocr_retry_interval=1)
+    ocr = ScriptedOCR(['AB12345', 'A812345', 'AB12345'])
+    for frame_index in range(10):
+        results = tracker.observe([candidate(x=100 + frame_index)], frame_index, ocr)
+    assert ocr.calls == 3
+    assert [r['plate'] for r in results] == ['AB12345']
+    assert len(tracker.active) == 1
+
+
+def test_settled_track_reported_once():
+    tracker = PlateTracker(ocr_per_track=2, ocr_retry_interval=1)
+    ocr = ScriptedOCR(['AB12345', 'AB12345'])
+    events = []
+    for frame_index in range(6):
+        tracker.observe([candidate()], frame_index, ocr)
+        events.extend(tracker.pop_events())
+    tracker.finish_all()
+    events.extend(tracker.pop_events())
+    assert [e['plate'] for e in events] == ['AB12345']
+
+
+def test_timeouts_do_not_use_up_attempts():
+    tracker = PlateTracker(ocr_per_track=1, max_ocr_attempts=2, ocr_retry_interval=1)
+    ocr = ScriptedOCR([OCR_TIMEOUT, OCR_TIMEOUT, OCR_TIMEOUT, 'AB12345'])
+    for frame_index in range(4):
+        tracker.observe([candidate()], frame_index, ocr)
+    track, = tracker.active
+    assert track.ocr_timeouts == 3
+    assert track.ocr_attempts == 1
+    assert track.plate == 'AB12345'
+
+
+def test_finish_all_drains_finished():
+    tracker = PlateTracker(max_missed=0, ocr_retry_interval=1)
+    ocr = ScriptedOCR(['AB12345', 'CD67890'])
+    tracker.observe([candidate()], 0, ocr)
+    tracker.observe([], 1, ocr)
+    tracker.observe([candidate(x=600)], 2, ocr)
+    assert [r['plate'] for r in tracker.finish_all()] == ['AB12345', 'CD67890']
+    assert tracker.finish_all() == []
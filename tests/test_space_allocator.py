@@ -0,0 +1,61 @@
+# test_space_allocator.py
+from space_allocator import SpaceAllocator
+
+
+def claim(storage, allocator, vehicle_types):
+    with storage.connection() as conn:
+        cursor = storage.cursor(conn)
+        claimed = allocator.claim(cursor, vehicle_types)
+        conn.commit()
+    return claimed
+
+
+def space_status(storage):
+    with storage.connection(write=False) as conn:
+        cursor = storage.cursor(conn)
+        cursor.execute("SELECT space_id, space_type, status FROM parking_spaces")
+        return {row['space_id']: (row['space_type'], row['status']) for row in cursor.fetchall()}
+
+
+def test_claim_by_type_with_fallback(storage):
+    allocator = SpaceAllocator(lock_clause='')
+    claimed = claim(storage, allocator, ['large_car', 'small_car', 'small_car', 'small_car'])
+    spaces = space_status(storage)
+    assert spaces[claimed[0]][0] == 'large_car'
+    assert {spaces[space_id][0] for space_id in claimed[1:3]} == {'small_car'}
+    # 小车位用完后小车不能占用已被大车占用的车位，也没有其他车位
+    assert claimed[3] is None
+    assert len(set(claimed[:3])) == 3
+    assert all(spaces[space_id][1] == 'occupied' for space_id in claimed[:3])
+    assert allocator.free_count() == {'small_car': 0, 'large_car': 0}
+
+
+def test_small_car_falls_back_to_large_space(storage):
+    allocator = SpaceAllocator(lock_clause='')
+    claimed = claim(storage, allocator, ['small_car'] * 3)
+    spaces = space_status(storage)
+    assert sorted(spaces[space_id][0] for space_id in claimed) == ['large_car', 'small_car', 'small_car']
+
+
+def test_release_returns_space(storage):
+    allocator = SpaceAllocator(lock_clause='')
+    space_id, = claim(storage, allocator, ['large_car'])
+    assert claim(storage, allocator, ['large_car']) == [None]
+    with storage.connection() as conn:
+        storage.cursor(conn).execute("UPDATE parking_spaces SET status = 'free' WHERE space_id = %s", (space_id,))
+        conn.commit()
+    allocator.release([space_id])
+    assert claim(storage, allocator, ['large_car']) == [space_id]
+
+
+def test_stale_candidates_are_skipped(storage):
+    allocator = SpaceAllocator(lock_clause='')
+    with storage.connection() as conn:
+        allocator.refresh(storage.cursor(conn))
+    # 其他入口（另一个进程）占用了全部小车位，本分配器的内存状态已过时
+    with storage.connection() as conn:
+        storage.cursor(conn).execute("UPDATE parking_spaces SET status = 'occupied' WHERE space_type = 'small_car'")
+        conn.commit()
+    large_id = next(space_id for space_id, (kind, _) in space_status(storage).items() if kind == 'large_car')
+    assert sorted(claim(storage, allocator, ['small_car', 'small_car']), key=str) == [large_id, None]
+    assert space_status(storage)[large_id][1] == 'occupied'
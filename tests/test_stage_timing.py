@@ -0,0 +1,74 @@
+# test_stage_timing.py
+import urllib.request
+import pytest
+from stage_timing import NULL_STAGE, RollingHistogram, StageTimers
+
+
+def test_histogram_quantiles():
+    histogram = RollingHistogram()
+    for ms in range(1, 101):
+        histogram.add(ms / 1000)
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['sum_ms'] == pytest.approx(5050.0)
+    assert (summary['p50_ms'], summary['p95_ms'], summary['p99_ms']) == (51.0, 96.0, 100.0)
+
+
+def test_histogram_window_keeps_totals():
+    histogram = RollingHistogram(window=10)
+    for ms in range(1, 21):
+        histogram.add(ms / 1000)
+    summary = histogram.summary()
+    # 分位数只看最近 10 个样本，次数和总耗时是累计值
+    assert summary['count'] == 20
+    assert summary['sum_ms'] == pytest.approx(210.0)
+    assert summary['p50_ms'] == 16.0
+    assert RollingHistogram().summary()['p99_ms'] == 0.0
+
+
+def test_disabled_timers_record_nothing():
+    timers = StageTimers()
+    with timers.stage('canny', 'lane-1') as stage:
+        pass
+    assert stage is NULL_STAGE
+    assert timers.snapshot() == {}
+
+
+def test_snapshot_groups_by_lane_and_stage():
+    timers = StageTimers(enabled=True)
+    with timers.stage('canny', 'lane-1'):
+        pass
+    timers.record('lane-1', 'ocr', 0.02)
+    timers.record('lane-2', 'ocr', 0.04)
+    snapshot = timers.snapshot()
+    assert sorted(snapshot) == ['lane-1', 'lane-2']
+    assert sorted(snapshot['lane-1']) == ['canny', 'ocr']
+    assert snapshot['lane-1']['canny']['count'] == 1
+    assert snapshot['lane-2']['ocr']['p50_ms'] == 40.0
+    timers.reset()
+    assert timers.snapshot() == {}
+
+
+def test_prometheus_text():
+    timers = StageTimers(enabled=True)
+    timers.record('default', 'ocr', 0.25)
+    lines = timers.prometheus_text().splitlines()
+    assert lines[1] == '# TYPE plate_stage_seconds summary'
+    assert 'plate_stage_seconds{lane="default",stage="ocr",quantile="0.5"} 0.250000' in lines
+    assert 'plate_stage_seconds_sum{lane="default",stage="ocr"} 0.250000' in lines
+    assert 'plate_stage_seconds_count{lane="default",stage="ocr"} 1' in lines
+
+
+def test_metrics_endpoint():
+    timers = StageTimers(enabled=True)
+    timers.record('default', 'ocr', 0.1)
+    server = timers.serve(port=0)
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode('utf-8')
+        assert body == timers.prometheus_text()
+        assert timers.serve() is server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,55 @@
+# test_storage.py
+import time
+import threading
+from datetime import datetime
+import pytest
+from fee_calculator import DEFAULT_BILLING_RULES
+from storage import SQLiteStorage
+
+
+def test_reads_do_not_wait_for_writer(storage):
+    storage.record_gate_events([{'plate': 'AB12345', 'type': 'small_car', 'seen_at': datetime(2024, 1, 1, 8, 0)}],
+                               DEFAULT_BILLING_RULES)
+    writing, done = threading.Event(), threading.Event()
+
+    def hold_write_lock():
+        with storage.connection() as conn:
+            writing.set()
+            done.wait(5)
+            conn.rollback()
+
+    writer = threading.Thread(target=hold_write_lock)
+    writer.start()
+    try:
+        assert writing.wait(5)
+        started = time.monotonic()
+        rows = storage.parked_vehicles()
+        elapsed = time.monotonic() - started
+    finally:
+        done.set()
+        writer.join()
+    assert elapsed < 1.0
+    assert [row['plate_number'] for row in rows] == ['AB12345']
+
+
+def test_migrate_is_idempotent(tmp_path):
+    path = str(tmp_path / 'parking.db')
+    storage = SQLiteStorage(path, spaces={'small_car': 2})
+    version = storage.migrate()
+    assert version == storage.migrate()
+    reopened = SQLiteStorage(path, spaces={'small_car': 5})
+    assert reopened.migrate() == version
+    # 已有车位时不再重复生成
+    with reopened.connection(write=False) as conn:
+        cursor = reopened.cursor(conn)
+        cursor.execute("SELECT COUNT(*) AS total FROM parking_spaces")
+        assert cursor.fetchone()['total'] == 2
+
+
+def test_check_schema_refuses_outdated_database(storage):
+    assert storage.check_schema() == storage.latest_version()
+    with storage.connection() as conn:
+        storage.set_schema_version(storage.cursor(conn), 0)
+        conn.commit()
+    with pytest.raises(RuntimeError, match="--migrate"):
+        storage.check_schema()
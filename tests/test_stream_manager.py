@@ -0,0 +1,105 @@
+# test_stream_manager.py
+import time
+from collections import Counter
+import pytest
+
+pytest.importorskip('cv2')
+pytest.importorskip('numpy')
+from ocr_backend import NullOCRBackend
+from stream_manager import StreamManager
+
+
+@pytest.fixture
+def manager():
+    """不启动线程，直接驱动 _next_job 检查调度"""
+    manager = StreamManager(workers=1, ocr=NullOCRBackend(), queue_size=100)
+    manager._running = True
+    return manager
+
+
+def fill(lane, count):
+    for i in range(count):
+        lane.queue.put((i, None))
+
+
+def take(manager, count):
+    order = []
+    for _ in range(count):
+        lane, item = manager._next_job()
+        order.append(lane.name)
+        manager._release(lane)
+    return order
+
+
+def test_priority_sets_share(manager):
+    fill(manager.add_lane('a', 'rtsp://cam/a', priority=2), 50)
+    fill(manager.add_lane('b', 'rtsp://cam/b', priority=1), 50)
+    assert Counter(take(manager, 30)) == {'a': 20, 'b': 10}
+
+
+def test_equal_priority_alternates(manager):
+    fill(manager.add_lane('a', 'rtsp://cam/a'), 10)
+    fill(manager.add_lane('b', 'rtsp://cam/b'), 10)
+    assert take(manager, 4) == ['a', 'b', 'a', 'b']
+
+
+def test_frames_of_a_lane_stay_in_order(manager):
+    fill(manager.add_lane('a', 'rtsp://cam/a'), 5)
+    items = []
+    for _ in range(5):
+        lane, item = manager._next_job()
+        items.append(item[0])
+        manager._release(lane)
+    assert items == [0, 1, 2, 3, 4]
+
+
+def test_busy_lane_is_not_scheduled_twice(manager):
+    fill(manager.add_lane('a', 'rtsp://cam/a'), 5)
+    fill(manager.add_lane('b', 'rtsp://cam/b'), 5)
+    first, _ = manager._next_job()
+    second, _ = manager._next_job()
+    assert {first.name, second.name} == {'a', 'b'}
+
+
+def test_new_lane_starts_at_min_pass(manager):
+    fill(manager.add_lane('a', 'rtsp://cam/a'), 20)
+    take(manager, 10)
+    late = manager.add_lane('b', 'rtsp://cam/b')
+    assert late.pass_value == manager.lanes['a'].pass_value
+    fill(late, 20)
+    # 后加入的车道不会连续独占工作线程
+    assert Counter(take(manager, 10)) == {'a': 5, 'b': 5}
+
+
+def test_exhausted_lane_finishes_once(manager):
+    lane = manager.add_lane('a', 'rtsp://cam/a')
+    fill(lane, 1)
+    lane.status = 'running'
+    lane.queue.close()
+    assert manager._next_job()[1] == (0, None)
+    manager._release(lane)
+    finished, item = manager._next_job()
+    assert finished is lane and item is None
+    assert lane.status == 'finished' and lane.done
+    manager._release(lane)
+    manager._running = False
+    assert manager._next_job() == (None, None)
+
+
+def test_failed_lane_keeps_error_status(manager):
+    errors = []
+    manager.on_lane_error = lambda name, message: errors.append((name, message))
+    lane = manager.add_lane('a', 'rtsp://cam/a')
+    fill(lane, 3)
+    manager._fail_lane(lane, '解码错误: boom')
+    finished, item = manager._next_job()
+    assert finished is lane and item is None
+    assert lane.status == 'error'
+    assert errors == [('a', '解码错误: boom')]
+
+
+def test_stats_marks_stalled_lane(manager):
+    lane = manager.add_lane('a', 'rtsp://cam/a')
+    lane.status = 'running'
+    lane.last_frame_at = time.monotonic() - manager.stall_timeout - 1
+    assert manager.stats()['a']['status'] == 'stalled'
@@ -1,29 +1,38 @@
 # ui_main.py
-import sys
-import math
-import logging
-import json
 import os
 import cv2
-import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QTextEdit, QPushButton, QFileDialog, QMessageBox, QFrame,
                              QStackedWidget)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
 from PyQt5.QtGui import QImage, QPixmap, QTextCursor, QFont
-from datetime import datetime
-import mysql.connector
 from video_processor import VideoProcessor
+from stream_manager import StreamManager
+from display_throttle import DisplayThrottle
+from plate_detector import PlateDetector, draw_boxes
+from ocr_backend import get_ocr_backend
+from ocr_cache import OCRCache, CachedOCRBackend
 from animation_window import AnimationWindow
 from billing_rules import BillingRulesPage
+from persistence_worker import PersistenceWorker
+
+# 视频识别时 OCR 进程池的大小（0 表示在识别线程内串行 OCR）和每帧 OCR 截止时间（秒）
+VIDEO_OCR_WORKERS = max(0, (os.cpu_count() or 1) - 2)
+VIDEO_OCR_TIMEOUT = 0.5
+# 识别画面的最大刷新帧率
+DISPLAY_FPS = 25
+
+class LaneSignals(QObject):
+    """把 StreamManager 工作线程中的回调转成 Qt 信号，交给界面线程处理"""
+    lane_result = pyqtSignal(str, list)
+    lane_events = pyqtSignal(str, list)
+    lane_finished = pyqtSignal(str, list)
+    lane_error = pyqtSignal(str, str)
+
+    def emit_result(self, lane_name, frame_index, frame, results):
+        if results:
+            self.lane_result.emit(lane_name, results)
 
-# 数据库配置（与 billing_rules.py 保持一致）
-db_config = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'zhang728',
-    'database': 'parking'
-}
 
 class LicensePlateRecognizer(QMainWindow):
     def __init__(self):
@@ -33,8 +42,25 @@ class LicensePlateRecognizer(QMainWindow):
         self.image_path = None
         self.video_path = None
         self.video_processor = None
+        self.stream_manager = None
+        self.lane_signals = None
+        self.display_throttle = DisplayThrottle(DISPLAY_FPS, self)
+        self.display_throttle.frame_ready.connect(self.show_video_frame)
+        self.display_throttle.results_ready.connect(self.handle_results)
+        self.stream_timer = QTimer(self)
+        self.stream_timer.timeout.connect(self.update_stream_stats)
         self.current_pixmap = None
         self.animation_window = None
+        # 图片与视频识别共用同一个 OCR 缓存
+        self.ocr_cache = OCRCache()
+        self.detector = PlateDetector(ocr=CachedOCRBackend(get_ocr_backend(), cache=self.ocr_cache))
+        # 入库在后台线程进行，界面和动画不等待 MySQL
+        self.persistence = PersistenceWorker(parent=self)
+        self.persistence.event_saved.connect(self.on_event_saved)
+        self.persistence.events_failed.connect(self.on_events_failed)
+        self.persistence.events_dropped.connect(self.on_events_dropped)
+        self.persistence.status_changed.connect(self.on_persistence_status)
+        self.persistence.start()
         self.init_ui()
 
     def init_ui(self):
@@ -108,6 +134,9 @@ class LicensePlateRecognizer(QMainWindow):
         self.media_label.setMinimumSize(800, 500)
         self.media_label.setStyleSheet("border: 1px solid gray; background-color: white;")
         left_layout.addWidget(self.media_label)
+        self.rate_label = QLabel("")
+        self.rate_label.setStyleSheet("color: gray;")
+        left_layout.addWidget(self.rate_label)
         right_frame = QFrame()
         right_frame.setMaximumWidth(350)
         right_layout = QVBoxLayout(right_frame)
@@ -130,6 +159,10 @@ class LicensePlateRecognizer(QMainWindow):
         self.upload_video_btn.clicked.connect(self.upload_video)
         self.upload_video_btn.setMinimumHeight(40)
         button_layout.addWidget(self.upload_video_btn)
+        self.multi_stream_btn = QPushButton("多路识别")
+        self.multi_stream_btn.clicked.connect(self.start_streams)
+        self.multi_stream_btn.setMinimumHeight(40)
+        button_layout.addWidget(self.multi_stream_btn)
         self.recognize_btn = QPushButton("开始识别")
         self.recognize_btn.clicked.connect(self.start_recognition)
         self.recognize_btn.setMinimumHeight(40)
@@ -160,6 +193,7 @@ class LicensePlateRecognizer(QMainWindow):
 
     def close_application(self):
         self.stop_recognition()
+        self.persistence.stop()
         if self.animation_window:
             self.animation_window.close()
         QApplication.quit()
@@ -215,6 +249,9 @@ class LicensePlateRecognizer(QMainWindow):
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
+        if self.video_processor:
+            self.video_processor.frame_ring.set_display_size(self.media_label.width() - 10,
+                                                             self.media_label.height() - 10)
         if self.current_pixmap and not self.current_pixmap.isNull():
             self.display_media(self.current_pixmap)
 
@@ -232,10 +269,16 @@ class LicensePlateRecognizer(QMainWindow):
             self.process_video()
 
     def stop_recognition(self):
+        # 先停止并等待产生结果的线程，再交出节流器中剩余的结果，之后不会再有新结果进入
         if self.video_processor:
             self.video_processor.stop()
             self.video_processor.wait()
             self.video_processor = None
+        if self.stream_manager:
+            self.stream_timer.stop()
+            self.stream_manager.stop()
+            self.stream_manager = None
+        self.display_throttle.flush()
         self.recognize_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
 
@@ -243,10 +286,11 @@ class LicensePlateRecognizer(QMainWindow):
         try:
             results = self.detect_plate(self.image_path)
             self.display_results(results, "图片")
+            # 视频轨迹投票绕过缓存查找，命中统计只反映图片识别
+            stats = self.ocr_cache.stats()
+            self.result_text.append(f"OCR 缓存: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
             if results:
                 self.save_to_database(results)
-                if self.animation_window:
-                    self.animation_window.update_plate_info(results[0])
         except Exception as e:
             QMessageBox.critical(self, "错误", f"识别过程中发生错误: {str(e)}")
         finally:
@@ -255,30 +299,102 @@ class LicensePlateRecognizer(QMainWindow):
     def process_video(self):
         if not self.video_path:
             return
-        self.video_processor = VideoProcessor(self.video_path)
+        self.video_processor = VideoProcessor(self.video_path, ocr_workers=VIDEO_OCR_WORKERS,
+                                              ocr_timeout=VIDEO_OCR_TIMEOUT, ocr_cache=self.ocr_cache)
+        self.video_processor.frame_ring.set_display_size(self.media_label.width() - 10,
+                                                         self.media_label.height() - 10)
+        self.display_throttle.release_slot = self.video_processor.frame_ring.release
         self.video_processor.frame_processed.connect(self.update_video_frame)
+        self.video_processor.tracks_settled.connect(self.save_to_database)
+        self.video_processor.gate_stats.connect(self.on_gate_stats)
+        self.video_processor.rate_updated.connect(self.on_rate_updated)
         self.video_processor.finished.connect(self.on_video_finished)
         self.video_processor.error_occurred.connect(self.on_video_error)
         self.video_processor.start()
 
-    def update_video_frame(self, frame, results):
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    def start_streams(self):
+        """多路视频同时识别，各车道共用一个检测/OCR 工作池"""
+        self.stop_recognition()
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "选择多路视频文件", "", "视频文件 (*.mp4 *.avi *.mov *.mkv *.flv)"
+        )
+        if not file_paths:
+            return
+        self.image_path = None
+        self.video_path = None
+        self.result_text.clear()
+        self.result_text.append(f"开始多路识别，共 {len(file_paths)} 路")
+        self.lane_signals = LaneSignals()
+        self.lane_signals.lane_result.connect(self.on_lane_result)
+        self.lane_signals.lane_events.connect(self.on_lane_events)
+        self.lane_signals.lane_finished.connect(self.on_lane_finished)
+        self.lane_signals.lane_error.connect(self.on_lane_error)
+        # 各车道共用一个 OCR 进程池，识别不会被单个 tesserocr 句柄的锁串行化
+        self.stream_manager = StreamManager(ocr_workers=VIDEO_OCR_WORKERS or None,
+                                            ocr_timeout=VIDEO_OCR_TIMEOUT,
+                                            on_result=self.lane_signals.emit_result,
+                                            on_events=self.lane_signals.lane_events.emit,
+                                            on_lane_finished=self.lane_signals.lane_finished.emit,
+                                            on_lane_error=self.lane_signals.lane_error.emit)
+        for i, file_path in enumerate(file_paths, 1):
+            self.stream_manager.add_lane(f"车道{i}", file_path)
+        self.stream_manager.start()
+        self.stream_timer.start(1000)
+        self.recognize_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+
+    def on_lane_result(self, lane_name, results):
+        self.display_throttle.submit(-1, [dict(result, lane=lane_name) for result in results])
+
+    def on_lane_events(self, lane_name, events):
+        self.save_to_database([dict(event, lane=lane_name) for event in events])
+
+    def on_lane_finished(self, lane_name, plates):
+        self.result_text.append(f"{lane_name} 识别完成，共检测到 {len(plates)} 个不同车牌")
+        if self.stream_manager and all(lane.done for lane in self.stream_manager.lanes.values()):
+            self.update_stream_stats()
+            self.stop_recognition()
+
+    def on_lane_error(self, lane_name, message):
+        self.result_text.append(f"{lane_name} 出错: {message}")
+        self.update_stream_stats()
+
+    def update_stream_stats(self):
+        if not self.stream_manager:
+            return
+        parts = []
+        for name, stats in self.stream_manager.stats().items():
+            parts.append(f"{name}[{stats['status']}] {stats['fps']:.0f}fps 滞后{stats['lag']:.1f}s")
+        self.rate_label.setText("    ".join(parts))
+
+    def update_video_frame(self, slot, results):
+        # 帧和结果先交给节流器，按显示帧率合并后再刷新界面
+        self.display_throttle.submit(slot, results)
+
+    def show_video_frame(self, slot):
+        if not self.video_processor:
+            return
+        # 槽位中已是缩放好的 RGB 帧，QImage 直接引用缓冲区，转成 QPixmap 后即可归还槽位
+        frame_ring = self.video_processor.frame_ring
+        frame_rgb = frame_ring.view(slot)
         height, width, channel = frame_rgb.shape
-        bytes_per_line = 3 * width
-        q_img = QImage(frame_rgb.data, width, height, bytes_per_line, QImage.Format_RGB888)
+        q_img = QImage(frame_rgb.data, width, height, frame_rgb.strides[0], QImage.Format_RGB888)
         pixmap = QPixmap.fromImage(q_img)
-        self.display_media(pixmap)
-        if results:
-            self.save_to_database(results)
-            for result in results:
-                self.add_result(result)
-                if self.animation_window:
-                    self.animation_window.update_plate_info(result)
+        frame_ring.release(slot)
+        self.media_label.setPixmap(pixmap)
+        self.current_pixmap = pixmap
 
-    def add_result(self, result):
+    def handle_results(self, results):
+        """一个刷新周期内合并的检测结果，更新结果列表；入库只处理投票稳定或已结束的轨迹"""
+        for result in results:
+            self.add_result(result, result.get('lane'))
+
+    def add_result(self, result, lane_name=None):
         # 保持原有代码
         current_text = self.result_text.toPlainText()
         if result['plate'] not in current_text:
+            if lane_name:
+                self.result_text.append(f"[{lane_name}]")
             self.result_text.append(f"检测到车牌: {result['plate']}")
             self.result_text.append(f"车型: {result['type']}")
             self.result_text.append(f"位置: {result['bbox']}")
@@ -288,11 +404,19 @@ class LicensePlateRecognizer(QMainWindow):
             self.result_text.setTextCursor(cursor)
 
     def on_video_finished(self, all_results):
+        self.stop_recognition()
         self.result_text.append("\n" + "=" * 50)
         self.result_text.append(f"视频识别完成！共检测到 {len(all_results)} 个不同车牌:\n")
         for i, result in enumerate(all_results, 1):
-            self.result_text.append(f"{i}. {result['plate']} ({result['type']})")
-        self.stop_recognition()
+            self.result_text.append(f"{i}. {result['plate']} ({result['type']}) "
+                                    f"出现 {result['hits']} 帧，轨迹 {len(result['track_ids'])} 条，"
+                                    f"首次 {result['first_time']:.1f}s，末次 {result['last_time']:.1f}s")
+
+    def on_rate_updated(self, effective_fps, lag):
+        self.rate_label.setText(f"处理帧率: {effective_fps:.1f} fps    滞后: {lag:.2f} 秒")
+
+    def on_gate_stats(self, checked, skipped):
+        self.result_text.append(f"运动检测: 共采样 {checked} 帧，无变化跳过 {skipped} 帧")
 
     def on_video_error(self, error_msg):
         QMessageBox.critical(self, "错误", error_msg)
@@ -309,284 +433,47 @@ class LicensePlateRecognizer(QMainWindow):
         else:
             self.result_text.append(f"未从{source_type}中识别到车牌")
 
-    # def save_to_database(self, results):
-    #     """将识别结果保存到数据库并处理进入/离开逻辑"""
-    #     try:
-    #         conn = mysql.connector.connect(**db_config)
-    #         cursor = conn.cursor(dictionary=True)
-    #
-    #         for result in results:
-    #             plate_number = result['plate']
-    #             plate_color = 'blue'  # 假设车牌颜色为蓝色（可根据实际需求修改）
-    #             entry_time = datetime.now()
-    #
-    #             # 检查车牌是否已存在
-    #             cursor.execute(
-    #                 "SELECT plate_id FROM license_plates WHERE plate_number = %s",
-    #                 (plate_number,)
-    #             )
-    #             plate = cursor.fetchone()
-    #             if not plate:
-    #                 # 插入新车牌
-    #                 cursor.execute(
-    #                     "INSERT INTO license_plates (plate_number, plate_color) VALUES (%s, %s)",
-    #                     (plate_number, plate_color)
-    #                 )
-    #                 plate_id = cursor.lastrowid
-    #             else:
-    #                 plate_id = plate['plate_id']
-    #
-    #             # 检查是否有未完成的停车记录
-    #             cursor.execute(
-    #                 """
-    #                 SELECT record_id, space_id FROM parking_records
-    #                 WHERE plate_id = %s AND status = 'parking'
-    #                 """,
-    #                 (plate_id,)
-    #             )
-    #             record = cursor.fetchone()
-    #
-    #             if record:
-    #                 # 车辆离开，更新离开时间并计算费用
-    #                 exit_time = datetime.now()
-    #                 total_amount = self.calculate_fee(entry_time, exit_time, plate_color)
-    #                 cursor.execute(
-    #                     "UPDATE parking_records SET exit_time = %s, status = 'completed' WHERE record_id = %s",
-    #                     (exit_time, record['record_id'])
-    #                 )
-    #                 cursor.execute(
-    #                     "UPDATE parking_spaces SET status = 'free' WHERE space_id = %s",
-    #                     (record['space_id'],)
-    #                 )
-    #                 cursor.execute(
-    #                     "INSERT INTO parking_fees (record_id, total_amount, payment_status) VALUES (%s, %s, %s)",
-    #                     (record['record_id'], total_amount, 'unpaid')
-    #                 )
-    #                 self.result_text.append(f"车辆 {plate_number} 离开，费用: {total_amount:.2f} 元")
-    #             else:
-    #                 # 车辆进入，分配空闲车位并记录
-    #                 cursor.execute(
-    #                     "SELECT space_id FROM parking_spaces WHERE status = 'free' LIMIT 1"
-    #                 )
-    #                 space = cursor.fetchone()
-    #                 if space:
-    #                     space_id = space['space_id']
-    #                     cursor.execute(
-    #                         """
-    #                         INSERT INTO parking_records (plate_id, space_id, entry_time, status)
-    #                         VALUES (%s, %s, %s, %s)
-    #                         """,
-    #                         (plate_id, space_id, entry_time, 'parking')
-    #                     )
-    #                     cursor.execute(
-    #                         "UPDATE parking_spaces SET status = 'occupied' WHERE space_id = %s",
-    #                         (space_id,)
-    #                     )
-    #                     self.result_text.append(f"车辆 {plate_number} 进入，分配车位 {space_id}")
-    #                 else:
-    #                     self.result_text.append(f"车辆 {plate_number} 进入失败：无空闲车位")
-    #
-    #             conn.commit()
-    #
-    #         cursor.close()
-    #         conn.close()
-    #
-    #     except Exception as e:
-    #         self.result_text.append(f"数据库操作错误: {e}")
-    #         QMessageBox.critical(self, "错误", f"数据库操作失败: {e}")
-    # ui_main.py (仅展示修改部分)
     def save_to_database(self, results):
-        try:
-            conn = mysql.connector.connect(**db_config)
-            cursor = conn.cursor(dictionary=True)
-
-            processed_plates = set()
-
-            for result in results:
-                plate_number = result['plate']
-                if plate_number in processed_plates:
-                    logging.info(f"忽略重复车牌: {plate_number}")
-                    continue
-                processed_plates.add(plate_number)
-
-                plate_color = result.get('plate_color', 'blue')
-                entry_time = datetime.now()
-
-                # 检查并更新车牌信息
-                cursor.execute(
-                    "SELECT plate_id, plate_color FROM license_plates WHERE plate_number = %s",
-                    (plate_number,)
-                )
-                plate = cursor.fetchone()
-                if not plate:
-                    logging.info(f"插入新车牌: {plate_number}, 颜色: {plate_color}")
-                    cursor.execute(
-                        "INSERT INTO license_plates (plate_number, plate_color) VALUES (%s, %s)",
-                        (plate_number, plate_color)
-                    )
-                    plate_id = cursor.lastrowid
-                else:
-                    plate_id = plate['plate_id']
-                    if plate['plate_color'] != plate_color:
-                        logging.info(f"更新车牌颜色: {plate_number}, 从 {plate['plate_color']} 到 {plate_color}")
-                        cursor.execute(
-                            "UPDATE license_plates SET plate_color = %s WHERE plate_id = %s",
-                            (plate_color, plate_id)
-                        )
-                    else:
-                        logging.info(f"车牌 {plate_number} 已存在，plate_id={plate_id}, 无需更新颜色")
-
-                # 检查停车记录
-                cursor.execute(
-                    """
-                    SELECT record_id, space_id, entry_time FROM parking_records
-                    WHERE plate_id = %s AND status = 'parking'
-                    """,
-                    (plate_id,)
-                )
-                record = cursor.fetchone()
-                direction = 'exit' if record else 'entry'
-
-                if record:
-                    exit_time = datetime.now()
-                    total_amount = self.calculate_fee(record['entry_time'], exit_time, plate_color)
-                    cursor.execute(
-                        "UPDATE parking_records SET exit_time = %s, status = 'completed' WHERE record_id = %s",
-                        (exit_time, record['record_id'])
-                    )
-                    cursor.execute(
-                        "UPDATE parking_spaces SET status = 'free' WHERE space_id = %s",
-                        (record['space_id'],)
-                    )
-                    cursor.execute(
-                        "INSERT INTO parking_fees (record_id, total_amount, payment_status) VALUES (%s, %s, %s)",
-                        (record['record_id'], total_amount, 'unpaid')
-                    )
-                    self.result_text.append(f"车辆 {plate_number} 离开，费用: {total_amount:.2f} 元")
-                    logging.info(f"车辆 {plate_number} 离开，record_id={record['record_id']}, 费用={total_amount:.2f}")
-                else:
-                    cursor.execute(
-                        "SELECT space_id FROM parking_spaces WHERE status = 'free' LIMIT 1"
-                    )
-                    space = cursor.fetchone()
-                    if space:
-                        space_id = space['space_id']
-                        cursor.execute(
-                            """
-                            INSERT INTO parking_records (plate_id, space_id, entry_time, status)
-                            VALUES (%s, %s, %s, %s)
-                            """,
-                            (plate_id, space_id, entry_time, 'parking')
-                        )
-                        cursor.execute(
-                            "UPDATE parking_spaces SET status = 'occupied' WHERE space_id = %s",
-                            (space_id,)
-                        )
-                        self.result_text.append(f"车辆 {plate_number} 进入，分配车位 {space_id}")
-                        logging.info(f"车辆 {plate_number} 进入，分配车位 {space_id}")
-                    else:
-                        self.result_text.append(f"车辆 {plate_number} 进入失败：无空闲车位")
-                        logging.warning(f"车辆 {plate_number} 进入失败：无空闲车位")
-                        continue
-
-                conn.commit()
-
-                # 联表查询最新状态
-                cursor.execute(
-                    """
-                    SELECT pr.record_id, lp.plate_number, lp.plate_color, pr.entry_time, pr.exit_time, pr.status
-                    FROM parking_records pr
-                    JOIN license_plates lp ON pr.plate_id = lp.plate_id
-                    WHERE lp.plate_number = %s
-                    ORDER BY pr.entry_time DESC LIMIT 1
-                    """,
-                    (plate_number,)
-                )
-                latest_record = cursor.fetchone()
-                if latest_record:
-                    self.result_text.append(
-                        f"车牌: {latest_record['plate_number']}, 颜色: {latest_record['plate_color']}, "
-                        f"状态: {latest_record['status']}, 进入时间: {latest_record['entry_time']}"
-                    )
-                    logging.info(f"最新记录: {latest_record}")
-
-                plate_info = {
-                    'plate': plate_number,
-                    'type': result['type'],
-                    'plate_color': plate_color,
-                    'direction': direction,
-                    'bbox': result['bbox']
-                }
-                if self.animation_window:
-                    self.animation_window.update_plate_info(plate_info)
-                    logging.info(f"传递车牌信息到动画: {plate_info}")
-
-            cursor.close()
-            conn.close()
+        """交给后台入库线程，处理结果通过 on_event_saved 回到界面。
 
-        except Exception as e:
-            logging.error(f"数据库操作错误: {e}")
-            self.result_text.append(f"数据库操作错误: {e}")
-            QMessageBox.critical(self, "错误", f"数据库操作失败: {e}")
+        视频识别时 results 是每条轨迹只出现一次的出入事件，不是逐帧结果。
+        """
+        self.persistence.submit(results)
 
-    def calculate_fee(self, entry_time, exit_time, plate_color):
-        """根据计费规则计算费用"""
-        try:
-            with open('billing_rules.json', 'r') as f:
-                rules = json.load(f)
-        except FileNotFoundError:
-            rules = [
-                {"plate_color": "blue", "time_range": "00:00-24:00", "first_hour": 5.0, "additional_hour": 2.0, "discount": 0.0},
-                {"plate_color": "green", "time_range": "00:00-24:00", "first_hour": 5.0, "additional_hour": 2.0, "discount": 10.0}
-            ]
-
-        duration_minutes = (exit_time - entry_time).total_seconds() / 60
-        hours = max(1, math.ceil(duration_minutes / 60))
-        current_hour = exit_time.hour
-
-        for rule in rules:
-            if rule['plate_color'] == plate_color:
-                time_start, time_end = map(lambda x: int(x.split(':')[0]), rule['time_range'].split('-'))
-                if time_start <= current_hour <= time_end or (time_end < time_start and (current_hour >= time_start or current_hour <= time_end)):
-                    total = rule['first_hour'] + (hours - 1) * rule['additional_hour']
-                    total *= (1 - rule['discount'] / 100)
-                    return total
-        return 0.0
+    def on_event_saved(self, outcome):
+        plate_number = outcome['plate']
+        if outcome['direction'] == 'duplicate':
+            # 刚进场或刚离场的车辆再次被识别，不是新的进出
+            return
+        if outcome['direction'] == 'exit':
+            self.result_text.append(f"车辆 {plate_number} 离开，费用: {outcome['fee']:.2f} 元")
+        elif outcome['direction'] == 'entry':
+            self.result_text.append(f"车辆 {plate_number} 进入，分配车位 {outcome['space_id']}")
+        else:
+            self.result_text.append(f"车辆 {plate_number} 进入失败：无空闲车位")
+            return
+        if self.animation_window:
+            self.animation_window.update_plate_info(outcome)
+
+    def on_events_failed(self, count, error):
+        self.result_text.append(f"数据库写入失败，{count} 条识别记录未保存: {error}")
+
+    def on_events_dropped(self, total):
+        self.result_text.append(f"入库队列已满，识别记录被丢弃（累计 {total} 条）")
+
+    def on_persistence_status(self, healthy, error):
+        if healthy:
+            self.result_text.append("数据库连接已恢复")
+        else:
+            self.result_text.append(f"数据库操作错误: {error}，正在重试")
 
     def detect_plate(self, image_path):
-        # 保持原有代码
         img = cv2.imread(image_path)
         if img is None:
             raise Exception(f"无法读取图像: {image_path}")
-        height, width = img.shape[:2]
-        if width > 1000:
-            scale = 1000 / width
-            img = cv2.resize(img, (int(width * scale), int(height * scale)))
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                       cv2.THRESH_BINARY, 11, 2)
-        edges = cv2.Canny(thresh, 50, 150)
-        contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        plates = []
-        for contour in contours:
-            x, y, w, h = cv2.boundingRect(contour)
-            aspect_ratio = w / float(h)
-            if 2 < aspect_ratio < 5 and w > 100 and h > 20:
-                plate_img = gray[y:y + h, x:x + w]
-                plate_img = cv2.convertScaleAbs(plate_img, alpha=1.5, beta=0)
-                plate_text = self.recognize_plate_text(plate_img)
-                if len(plate_text) > 5 and any(c.isalpha() for c in plate_text) and any(
-                        c.isdigit() for c in plate_text):
-                    car_type = 'small_car' if w < 400 else 'large_car'
-                    plates.append({
-                        'plate': plate_text,
-                        'type': car_type,
-                        'bbox': (x, y, w, h)
-                    })
-                    cv2.rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                    cv2.putText(img, plate_text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        plates = self.detector.detect([img])[0]
         if plates:
+            img = draw_boxes(img, plates)
             img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
             height, width, channel = img_rgb.shape
             bytes_per_line = 3 * width
@@ -595,21 +482,9 @@ class LicensePlateRecognizer(QMainWindow):
             self.display_media(pixmap)
         return plates
 
-    def recognize_plate_text(self, plate_img):
-        # 保持原有代码
-        try:
-            import pytesseract
-            pytesseract.pytesseract.tesseract_cmd = r'D:\tesseract\tesseract.exe'
-            plate_text = pytesseract.image_to_string(
-                plate_img,
-                config='--psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-            ).strip()
-            return plate_text
-        except:
-            return "OCR_ERROR"
-
     def closeEvent(self, event):
         self.stop_recognition()
+        self.persistence.stop()
         if self.animation_window:
             self.animation_window.close()
         event.accept()
\ No newline at end of file
@@ -1,97 +1,132 @@
 # video_processor.py
-import cv2
-import numpy as np
+import os
+import time
 from PyQt5.QtCore import QThread, pyqtSignal
+from plate_detector import PlateDetector, draw_boxes
+from ocr_backend import get_ocr_backend, PoolOCRBackend
+from ocr_cache import CachedOCRBackend
+from frame_pipeline import FramePipeline
+from frame_source import FrameSource
+from motion_gate import MotionGate
+from plate_tracker import PlateTracker
+from camera_config import load_camera_config
+from adaptive_sampler import AdaptiveSampler
+from plate_aggregator import PlateAggregator
+from frame_ring import FrameRing
 
 class VideoProcessor(QThread):
-    frame_processed = pyqtSignal(np.ndarray, list)
+    # 参数为 frame_ring 的槽位序号（-1 表示本帧不显示）和检测结果
+    frame_processed = pyqtSignal(int, list)
+    # 投票稳定或已结束的轨迹，每条轨迹一次，用于入库
+    tracks_settled = pyqtSignal(list)
     finished = pyqtSignal(list)
+    gate_stats = pyqtSignal(int, int)
+    rate_updated = pyqtSignal(float, float)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, video_path):
+    def __init__(self, video_path, ocr_workers=0, ocr_timeout=None,
+                 detect_workers=2, queue_size=8, drop_oldest=None, gate_region=None,
+                 motion_gate=True, ocr_cache=None, adaptive=None):
         super().__init__()
         self.video_path = video_path
         self.is_running = True
+        # ocr_workers > 0 时候选区域分发到进程池识别，ocr_timeout 为每帧的 OCR 截止时间（秒）
+        self.ocr_pool = PoolOCRBackend(workers=ocr_workers, frame_timeout=ocr_timeout) if ocr_workers > 0 else None
+        # 识别结果写入共享的感知哈希缓存供图片识别复用；轨迹投票需要独立读数，不查缓存
+        self.ocr = CachedOCRBackend(self.ocr_pool or get_ocr_backend(), cache=ocr_cache)
+        self.camera = load_camera_config(video_path)
+        self.lane = os.path.basename(str(video_path))
+        self.detector = PlateDetector(ocr=self.ocr, camera=self.camera, lane=self.lane)
+        self.detect_workers = detect_workers
+        self.queue_size = queue_size
+        # 默认只对摄像头等实时源丢弃旧帧，视频文件逐帧处理不丢帧
+        is_live = not FrameSource(video_path).is_file
+        self.drop_oldest = is_live if drop_oldest is None else drop_oldest
+        # 实时源默认启用自适应采样，文件源保持固定间隔
+        self.adaptive = is_live if adaptive is None else adaptive
+        self.sampler = None
+        # 按车牌号汇总的结果，识别过程中可以随时通过 aggregator.snapshot() 查询
+        self.aggregator = None
+        self._last_rate_emit = 0.0
+        self.pipeline = None
+        self.frame_ring = FrameRing()
+        # 运动门控：闸口区域 gate_region（相对比例）无变化时跳过完整检测
+        gate_region = gate_region if gate_region is not None else self.camera.get('gate_region')
+        self.motion_gate = MotionGate(gate_region=gate_region) if motion_gate else None
 
     def run(self):
+        source = FrameSource(self.video_path)
         try:
-            cap = cv2.VideoCapture(self.video_path)
-            if not cap.isOpened():
+            if not source.open():
                 self.error_occurred.emit(f"无法打开视频: {self.video_path}")
                 return
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_interval = max(1, int(fps / 10))
-            frame_count = 0
-            all_results = []
-            while self.is_running and cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                if frame_count % frame_interval == 0:
-                    results = self.detect_plate_from_frame(frame.copy())
-                    processed_frame = self.draw_boxes_on_frame(frame.copy(), results)
-                    for result in results:
-                        if result['plate'] not in [r['plate'] for r in all_results]:
-                            all_results.append(result)
-                    self.frame_processed.emit(processed_frame, results)
-                frame_count += 1
+            self.sampler = AdaptiveSampler(source.fps)
+            if self.adaptive:
+                frame_interval = self.sampler.interval
+            else:
+                frame_interval = max(1, int(source.fps / 10))
+            tracker = PlateTracker()
+            self.aggregator = PlateAggregator(source.fps)
+            self.pipeline = FramePipeline(
+                self._timed_frames(source.sampled_frames(frame_interval, lambda: self.is_running)),
+                lambda: PlateDetector(ocr=self.ocr, camera=self.camera, lane=self.lane).locate,
+                workers=self.detect_workers,
+                queue_size=self.queue_size,
+                drop_oldest=self.drop_oldest,
+                gate=self.motion_gate
+            )
+            self.pipeline.start()
+            for frame_index, frame, candidates in self.pipeline.results():
+                # 检测线程只定位候选区域；轨迹关联必须按帧顺序进行，
+                # 只有需要补充读数的轨迹才送去 OCR
+                results = tracker.observe(candidates, frame_index, self.detector)
+                self.aggregator.update(results, frame_index)
+                self._update_rate(frame_index, tracker)
+                self.frame_processed.emit(self.frame_ring.write(frame, results), results)
+                self._emit_settled(tracker)
                 if not self.is_running:
                     break
-            cap.release()
-            self.finished.emit(all_results)
+            tracker.finish_all()
+            self._emit_settled(tracker)
+            if self.motion_gate:
+                self.gate_stats.emit(self.motion_gate.checked, self.motion_gate.skipped)
+            self.finished.emit(self.aggregator.snapshot())
         except Exception as e:
             self.error_occurred.emit(f"视频处理错误: {str(e)}")
+        finally:
+            if self.pipeline:
+                self.pipeline.stop()
+                self.pipeline.join()
+            source.release()
+            if self.ocr_pool:
+                self.ocr_pool.close()
+
+    def _emit_settled(self, tracker):
+        events = tracker.pop_events()
+        if events:
+            self.tracks_settled.emit(events)
+
+    def _timed_frames(self, frames):
+        for frame_index, frame in frames:
+            self.sampler.frame_decoded(frame_index)
+            yield frame_index, frame
+
+    def _update_rate(self, frame_index, tracker):
+        motion = self.motion_gate is not None and self.motion_gate.active
+        self.sampler.set_active(motion or any(track.plate for track in tracker.active))
+        self.sampler.frame_done(frame_index)
+        now = time.monotonic()
+        if now - self._last_rate_emit >= 1.0:
+            self._last_rate_emit = now
+            self.rate_updated.emit(self.sampler.effective_fps, self.sampler.lag)
 
     def stop(self):
         self.is_running = False
+        if self.pipeline:
+            self.pipeline.stop()
 
     def detect_plate_from_frame(self, frame):
-        if frame is None:
-            return []
-        height, width = frame.shape[:2]
-        if width > 1000:
-            scale = 1000 / width
-            frame = cv2.resize(frame, (int(width * scale), int(height * scale)))
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                       cv2.THRESH_BINARY, 11, 2)
-        edges = cv2.Canny(thresh, 50, 150)
-        contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        plates = []
-        for contour in contours:
-            x, y, w, h = cv2.boundingRect(contour)
-            aspect_ratio = w / float(h)
-            if 2 < aspect_ratio < 5 and w > 100 and h > 20:
-                plate_img = gray[y:y + h, x:x + w]
-                plate_img = cv2.convertScaleAbs(plate_img, alpha=1.5, beta=0)
-                plate_text = self.recognize_plate_text(plate_img)
-                if len(plate_text) > 5 and any(c.isalpha() for c in plate_text) and any(
-                        c.isdigit() for c in plate_text):
-                    car_type = 'small_car' if w < 400 else 'large_car'
-                    plates.append({
-                        'plate': plate_text,
-                        'type': car_type,
-                        'bbox': (x, y, w, h)
-                    })
-        return plates
-
-    def recognize_plate_text(self, plate_img):
-        try:
-            import pytesseract
-            pytesseract.pytesseract.tesseract_cmd = r'D:\tesseract\tesseract.exe'
-            plate_text = pytesseract.image_to_string(
-                plate_img,
-                config='--psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-            ).strip()
-            return plate_text
-        except:
-            return "OCR_ERROR"
+        return self.detector.detect([frame])[0]
 
     def draw_boxes_on_frame(self, frame, results):
-        for result in results:
-            x, y, w, h = result['bbox']
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.putText(frame, result['plate'], (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        return frame
\ No newline at end of file
+        return draw_boxes(frame, results)